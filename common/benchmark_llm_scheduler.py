@@ -0,0 +1,100 @@
+"""Interactive latency and batch throughput with and without priority scheduling of the LLM.
+
+Simulates the shared Ollama server: a generation holds one of --max-concurrency slots for its service
+time. Batch workers keep issuing long generations back to back while interactive requests arrive at a
+fixed rate; the same load runs once through a single FIFO class and once through the priority classes.
+
+    python common/benchmark_llm_scheduler.py --interactive-rps 1 --batch-workers 6
+"""
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.llm_scheduler import LLMScheduler
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def generate(scheduler, priority, tenant, service_s):
+    """One simulated generation; returns its latency including the wait for a slot."""
+    start = time.perf_counter()
+    with scheduler.slot(priority, tenant):
+        time.sleep(service_s * random.uniform(0.8, 1.2))
+    return time.perf_counter() - start
+
+
+def run(name, scheduler, interactive_priority, batch_priority, args):
+    stop = threading.Event()
+    interactive, batch = [], []
+
+    def batch_worker(i):
+        while not stop.is_set():
+            latency = generate(scheduler, batch_priority, f"report-{i}", args.batch_ms / 1000)
+            batch.append((time.perf_counter(), latency))
+
+    def interactive_request(i):
+        interactive.append(generate(scheduler, interactive_priority, f"thread-{i % 4}", args.interactive_ms / 1000))
+
+    workers = [threading.Thread(target=batch_worker, args=(i,)) for i in range(args.batch_workers)]
+    for worker in workers:
+        worker.start()
+    time.sleep(args.batch_ms / 1000)  # let the batch work fill the queue first
+
+    requests = []
+    start = time.perf_counter()
+    for i in range(int(args.duration * args.interactive_rps)):
+        # Open loop: requests are sent on schedule whether or not the earlier ones finished
+        time.sleep(max(start + i / args.interactive_rps - time.perf_counter(), 0))
+        request = threading.Thread(target=interactive_request, args=(i,))
+        request.start()
+        requests.append(request)
+    for request in requests:
+        request.join()
+    end = time.perf_counter()
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    # Batch throughput counts only the calls that finished while interactive requests were coming in
+    batch = [latency for finished, latency in batch if start <= finished <= end]
+    interactive.sort()
+    print(f"{name:<10} interactive p50 {percentile(interactive, 0.5):6.2f}s, p95 {percentile(interactive, 0.95):6.2f}s, "
+          f"max {interactive[-1] if interactive else 0:6.2f}s; "
+          f"batch {len(batch) / (end - start):5.2f} calls/s (mean {statistics.mean(batch) if batch else 0:6.2f}s)")
+    for priority, s in scheduler.stats().items():
+        if s["completed"]:
+            print(f"{'':<10} {priority:<12} wait p50 {s['wait_p50_s']}s, p95 {s['wait_p95_s']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare FIFO and priority scheduling of LLM calls on a "
+                                                 "simulated Ollama server")
+    parser.add_argument("--max-concurrency", type=int, default=2, help="Generations the server runs at once")
+    parser.add_argument("--batch-max-concurrency", type=int, default=1)
+    parser.add_argument("--reserve-idle-s", type=float, default=30,
+                        help="Idle time of the higher classes after which batch may use their slots")
+    parser.add_argument("--batch-workers", type=int, default=6, help="Batch jobs issuing generations back to back")
+    parser.add_argument("--batch-ms", type=float, default=2000, help="Service time of a batch generation")
+    parser.add_argument("--interactive-ms", type=float, default=500, help="Service time of an interactive generation")
+    parser.add_argument("--interactive-rps", type=float, default=1)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of interactive requests")
+    args = parser.parse_args()
+
+    print(f"{args.max_concurrency} slots, {args.batch_workers} batch workers, "
+          f"{args.interactive_rps} interactive rps for {args.duration}s\n")
+    run("fifo", LLMScheduler(args.max_concurrency), "normal", "normal", args)
+    run("priority", LLMScheduler(args.max_concurrency, {"batch": args.batch_max_concurrency}, args.reserve_idle_s),
+        "interactive", "batch", args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import time
+
+# Wall-clock budget of one graph run, in seconds
+RUN_TIMEOUT = float(os.environ.get("RUN_TIMEOUT", "120"))
+# Optional steps (grading, rewriting, fact checking) are skipped when less than this many seconds are left
+OPTIONAL_STEP_BUDGET = float(os.environ.get("OPTIONAL_STEP_BUDGET", "15"))
+
+_current = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The run's deadline has passed. A TimeoutError, so the existing timeout handling (e.g. 504s) applies."""
+
+
+class Deadline:
+    """The point in time a run must finish by, and what is left of its budget."""
+
+    def __init__(self, seconds=RUN_TIMEOUT):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def timeout(self, limit=None):
+        """The remaining budget as a call timeout, at most limit; raises DeadlineExceeded once nothing is left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Run deadline of {self.seconds:g}s exceeded")
+        return remaining if limit is None else min(remaining, limit)
+
+    def allows(self, seconds=OPTIONAL_STEP_BUDGET):
+        """Whether at least seconds are left, i.e. whether an optional step still fits."""
+        return self.remaining() >= seconds
+
+
+def current():
+    """The deadline of the run in progress, or None outside of one.
+
+    It is kept in a context variable, which asyncio tasks and LangGraph's node executors copy, so every node
+    of a run sees it without threading it through the graph state. Plain ThreadPoolExecutor workers need
+    contextvars.copy_context().run to see it.
+    """
+    return _current.get()
+
+
+@contextlib.contextmanager
+def scope(deadline):
+    """Makes deadline the current one for the code inside (sync runs; the calls in it budget themselves)."""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+@contextlib.asynccontextmanager
+async def limit(seconds=RUN_TIMEOUT):
+    """Runs the code inside under a new deadline and cancels whatever it awaits once the deadline passes."""
+    deadline = Deadline(seconds)
+    with scope(deadline):
+        try:
+            async with asyncio.timeout(seconds):
+                yield deadline
+        except DeadlineExceeded:
+            raise
+        except TimeoutError as e:
+            if deadline.expired:
+                raise DeadlineExceeded(f"Run deadline of {seconds:g}s exceeded") from e
+            raise
+
+
+def remaining_timeout(default):
+    """Timeout for a call: default, cut down to what is left of the current deadline."""
+    deadline = current()
+    return default if deadline is None else deadline.timeout(default)
+
+
+def allows(seconds=OPTIONAL_STEP_BUDGET):
+    """Whether an optional step still fits in the current deadline; always true outside of a run."""
+    deadline = current()
+    return deadline is None or deadline.allows(seconds)
+
+
+async def bounded(awaitable, default=None):
+    """Awaits awaitable, cancelling it (and the request behind it) when the current deadline or default runs out."""
+    try:
+        timeout = remaining_timeout(default)
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except DeadlineExceeded:
+        raise
+    except TimeoutError as e:
+        deadline = current()
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceeded(f"Run deadline of {deadline.seconds:g}s exceeded") from e
+        raise
+
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+DEFAULT_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.expanduser("~/.cache/llm-agents-investigation/http"))
+DEFAULT_TTL = 3600
+DEFAULT_TIMEOUT = 20
+USER_AGENT = "Mozilla/5.0 (compatible; llm-agents-investigation)"
+
+# Minimum delay between two requests to the same host, in seconds
+HOST_MIN_INTERVAL = {
+    "scholar.google.com": 2.0,
+    "news.ycombinator.com": 1.0,
+}
+
+
+class HttpFetcher:
+    """Pooled HTTP GET client with an on-disk response cache, conditional requests and per-host rate limiting.
+
+    Response bodies are stored once under the SHA-256 of their content; a small JSON index entry per URL
+    keeps the validators (ETag / Last-Modified) and the time the body was last confirmed fresh.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, default_ttl=DEFAULT_TTL, host_min_interval=None,
+                 pool_size=20, retries=3, backoff_factor=0.5):
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.host_min_interval = dict(HOST_MIN_INTERVAL if host_min_interval is None else host_min_interval)
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET"]), respect_retry_after_header=True,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._host_lock = threading.Lock()
+        self._host_next_slot = {}
+
+        os.makedirs(os.path.join(self.cache_dir, "index"), exist_ok=True)
+        os.makedirs(os.path.join(self.cache_dir, "blobs"), exist_ok=True)
+
+    def get(self, url, ttl=None, timeout=DEFAULT_TIMEOUT, max_bytes=None, headers=None):
+        """Returns a requests.Response for url, served from the cache while it is younger than ttl seconds.
+
+        timeout bounds both the socket operations and the total time spent reading the body.
+        Only complete 200 responses are cached (bodies cut at max_bytes are not); the returned response
+        has a from_cache attribute.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        entry = self._read_entry(url)
+
+        if entry and time.time() - entry["fetched_at"] < ttl:
+            return self._cached_response(url, entry)
+
+        request_headers = dict(headers or {})
+        if entry:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        self._wait_for_host(url)
+        response = self._download(url, request_headers, timeout, max_bytes)
+
+        if response.status_code in (429, 503):
+            self._penalize_host(url, response.headers.get("Retry-After"))
+
+        if response.status_code == 304 and entry:
+            entry["fetched_at"] = time.time()
+            self._write_entry(url, entry)
+            return self._cached_response(url, entry)
+
+        if response.status_code == 200 and not response.truncated:
+            self._store(url, response)
+
+        response.from_cache = False
+        return response
+
+    def _download(self, url, headers, timeout, max_bytes):
+        deadline = time.monotonic() + timeout
+        response = self.session.get(url, headers=headers, timeout=timeout, stream=True)
+        with response:
+            content = bytearray()
+            response.truncated = False
+            for block in response.iter_content(64 * 1024):
+                if time.monotonic() > deadline:
+                    raise requests.Timeout(f"Reading {url} took longer than {timeout}s")
+                content.extend(block)
+                if max_bytes and len(content) >= max_bytes:
+                    response.truncated = True
+                    del content[max_bytes:]
+                    break
+            response._content = bytes(content)
+        return response
+
+    def _wait_for_host(self, url):
+        host = urlsplit(url).hostname
+        interval = self.host_min_interval.get(host, 0)
+        with self._host_lock:
+            now = time.monotonic()
+            slot = max(now, self._host_next_slot.get(host, 0))
+            self._host_next_slot[host] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _penalize_host(self, url, retry_after):
+        host = urlsplit(url).hostname
+        delay = max(self.host_min_interval.get(host, 0), 1.0) * 2
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+                except (TypeError, ValueError):
+                    # Neither seconds nor an HTTP date: keep the default delay
+                    pass
+        with self._host_lock:
+            self._host_next_slot[host] = max(self._host_next_slot.get(host, 0), time.monotonic() + delay)
+
+    def _entry_path(self, url):
+        return os.path.join(self.cache_dir, "index", hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.cache_dir, "blobs", digest)
+
+    def _read_entry(self, url):
+        try:
+            with open(self._entry_path(url), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self._blob_path(entry["digest"])):
+            return None
+        return entry
+
+    def _write_entry(self, url, entry):
+        path = self._entry_path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def _store(self, url, response):
+        digest = hashlib.sha256(response.content).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            tmp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(response.content)
+            os.replace(tmp_path, blob_path)
+
+        self._write_entry(url, {
+            "url": url,
+            "digest": digest,
+            "fetched_at": time.time(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type"),
+            "encoding": response.encoding,
+        })
+
+    def _cached_response(self, url, entry):
+        with open(self._blob_path(entry["digest"]), "rb") as f:
+            content = f.read()
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = content
+        response.encoding = entry.get("encoding")
+        response.headers = CaseInsensitiveDict({
+            key: value for key, value in (
+                ("Content-Type", entry.get("content_type")),
+                ("ETag", entry.get("etag")),
+                ("Last-Modified", entry.get("last_modified")),
+            ) if value
+        })
+        response.from_cache = True
+        return response
+
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Returns the process-wide fetcher shared by all scrapers."""
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = HttpFetcher()
+        return _default_fetcher
+
+
+def fetch(url, ttl=None, timeout=DEFAULT_TIMEOUT, max_bytes=None, headers=None):
+    """Cached GET through the shared fetcher; see HttpFetcher.get."""
+    return get_fetcher().get(url, ttl=ttl, timeout=timeout, max_bytes=max_bytes, headers=headers)
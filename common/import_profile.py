@@ -0,0 +1,118 @@
+"""Import-time profile of the repo's services and scripts.
+
+Imports each target in a fresh interpreter with -X importtime, the way a new process or worker does, and
+reports the wall time of the import and the direct imports that cost the most. The targets keep their
+heavy resources behind lazy getters, so importing them must not connect to anything.
+
+    python common/import_profile.py --output before.json
+    python common/import_profile.py --compare before.json
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+TARGETS = {
+    "github-crawler": "github-crawler/main.py",
+    "mcp-v1": "mcp/v1/mcp_server.py",
+    "mcp-sse": "mcp/fast_mcp/mcp_sse_server.py",
+    "llama-index": "llama_index/llama_index_test.py",
+    "multiple-agents": "multiple_agent_investigation/langgraph_multiple_agents.py",
+}
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_once(path):
+    """Imports the module at path in a new interpreter; returns (wall seconds, [(depth, name, cumulative us)])."""
+    module = path.stem
+    code = f"import sys; sys.path.insert(0, {str(path.parent)!r}); import {module}"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=path.parent,
+                            capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit code {result.returncode}"
+        raise RuntimeError(error)
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            entries.append(((len(match.group(3)) - 1) // 2, match.group(4), int(match.group(2))))
+    return elapsed, entries
+
+
+def direct_imports(entries, module):
+    """The imports made by module itself, with their cumulative time in ms, most expensive first."""
+    # importtime prints a module after everything it imported, one level deeper than itself
+    for index in range(len(entries) - 1, -1, -1):
+        depth, name, _ = entries[index]
+        if name == module:
+            break
+    else:
+        return []
+    children = []
+    for child_depth, name, cumulative in reversed(entries[:index]):
+        if child_depth <= depth:
+            break
+        if child_depth == depth + 1:
+            children.append((name, round(cumulative / 1000, 1)))
+    return sorted(children, key=lambda child: child[1], reverse=True)
+
+
+def profile(name, runs, top):
+    path = REPO_ROOT / TARGETS[name]
+    walls, cumulatives = [], []
+    children = []
+    for _ in range(runs):
+        try:
+            elapsed, entries = import_once(path)
+        except RuntimeError as e:
+            print(f"{name:<16} import failed: {e}")
+            return {"error": str(e)}
+        walls.append(elapsed)
+        cumulatives.append(next((c for _, n, c in reversed(entries) if n == path.stem), 0) / 1000)
+        children = direct_imports(entries, path.stem)
+
+    report = {
+        "wall_ms": round(statistics.median(walls) * 1000, 1),
+        "import_ms": round(statistics.median(cumulatives), 1),
+        "top_imports": children[:top],
+    }
+    print(f"{name:<16} import {report['import_ms']:8.1f} ms, process {report['wall_ms']:8.1f} ms; "
+          + ", ".join(f"{child} {ms:.0f} ms" for child, ms in report["top_imports"]))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long the repo's services and scripts take to import")
+    parser.add_argument("--target", nargs="+", choices=sorted(TARGETS), default=list(TARGETS))
+    parser.add_argument("--runs", type=int, default=5, help="Imports per target; the median is reported")
+    parser.add_argument("--top", type=int, default=5, help="Most expensive direct imports to list")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to compare with")
+    args = parser.parse_args()
+
+    results = {name: profile(name, args.runs, args.top) for name in args.target}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("\nCompared with", args.compare)
+        for name, result in results.items():
+            before = baseline.get(name, {})
+            if "import_ms" in before and "import_ms" in result:
+                print(f"  {name:<16} import {before['import_ms']:.0f} -> {result['import_ms']:.0f} ms, "
+                      f"process {before['wall_ms']:.0f} -> {result['wall_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import asyncio
+import functools
+import threading
+
+
+def lazy(factory):
+    """Turns a zero-argument factory into a getter that builds the object on the first call.
+
+    The object is built once even when several threads ask for it at the same time, so it can hold
+    something exclusive such as a local Qdrant collection. Heavy imports belong inside the factory, so
+    that importing the module stays cheap and processes that never use the object never pay for it.
+    """
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(factory)
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    get.built = lambda: bool(instance)
+    return get
+
+
+async def aget(getter):
+    """Returns the object of a lazy getter from async code, building it in a worker thread the first time."""
+    return getter() if getter.built() else await asyncio.to_thread(getter)
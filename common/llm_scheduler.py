@@ -0,0 +1,421 @@
+"""Priority scheduler for the calls to the shared local LLM.
+
+Every chat model made by ollama_models.chat_model waits here for a slot before it generates, so at most
+LLM_MAX_CONCURRENCY generations of the process run against Ollama at once. Free slots go to the highest
+priority class with a waiting call whose class is below its own limit; batch work is capped below the
+total, so a slot is left for interactive calls, except while no higher class has asked for one in the
+last LLM_RESERVE_IDLE_S seconds. Within a class, tenants (e.g. thread_ids) take turns.
+
+The class and tenant of a call come from the enclosing scheduling() block, else from the priority the
+model was created with (chat_model(..., priority="batch")), else from LLM_PRIORITY:
+
+    with llm_scheduler.scheduling("interactive", tenant=thread_id):
+        ...
+
+Run as a script, it is an HTTP proxy in front of Ollama that schedules the generations of all processes
+pointed at it (OLLAMA_BASE_URL=http://localhost:11435). The proxy reads the class from the X-LLM-Priority
+header, which chat_model sets from the class the model is created in, and treats each process as a tenant.
+Clients that cannot set headers put the class in the URL instead: OLLAMA_HOST=http://localhost:11435/interactive.
+
+    python common/llm_scheduler.py --max-concurrency 2
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import deadline
+
+# Highest priority first
+PRIORITY_CLASSES = ("interactive", "normal", "batch")
+# Generations run at once; match it to OLLAMA_NUM_PARALLEL of the Ollama server
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "2"))
+# Slots batch calls may hold together; the rest stays free for the other classes
+LLM_BATCH_MAX_CONCURRENCY = int(os.environ.get("LLM_BATCH_MAX_CONCURRENCY", max(LLM_MAX_CONCURRENCY - 1, 1)))
+# A class under its limit may still take the slots kept for the classes above it once these have made no
+# call for this many seconds, so batch work uses the whole server while nobody is waiting interactively
+LLM_RESERVE_IDLE_S = float(os.environ.get("LLM_RESERVE_IDLE_S", "30"))
+# Class of the calls made outside a scheduling() block, e.g. LLM_PRIORITY=batch for a report script
+LLM_PRIORITY = os.environ.get("LLM_PRIORITY", "normal")
+DEFAULT_TENANT = "default"
+# Queue waits kept per class for the percentiles
+WAIT_SAMPLES = 1000
+
+LLM_SCHEDULER_PORT = int(os.environ.get("LLM_SCHEDULER_PORT", "11435"))
+PRIORITY_HEADER = "X-LLM-Priority"
+TENANT_HEADER = "X-LLM-Tenant"
+# Requests that make Ollama generate; everything else is passed through without waiting
+SCHEDULED_PATHS = ("/api/chat", "/api/generate")
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "content-encoding", "host"}
+
+_request = contextvars.ContextVar("llm_request", default=None)
+_holding = contextvars.ContextVar("llm_slot_held", default=False)
+
+
+@contextlib.contextmanager
+def scheduling(priority, tenant=None):
+    """Runs the LLM calls made inside in the given priority class, on behalf of tenant."""
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class {priority!r}, expected one of {PRIORITY_CLASSES}")
+    token = _request.set((priority, tenant or DEFAULT_TENANT))
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+
+def current_request(priority=None, tenant=None):
+    """(priority class, tenant) of the calls made here; priority and tenant apply outside scheduling() blocks."""
+    return _request.get() or (priority or LLM_PRIORITY, tenant or DEFAULT_TENANT)
+
+
+class _Waiter:
+    __slots__ = ("priority", "tenant", "enqueued_at", "granted", "_event", "_loop", "_future")
+
+    def __init__(self, priority, tenant, loop=None):
+        self.priority = priority
+        self.tenant = tenant
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self._loop = loop
+        self._future = loop.create_future() if loop is not None else None
+        self._event = threading.Event() if loop is None else None
+
+    def wake(self):
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(lambda: self._future.done() or self._future.set_result(None))
+
+
+class LLMScheduler:
+    """Hands out max_concurrency slots by strict priority between classes and round robin between tenants.
+
+    A class holds at most its limit in class_limits, or all slots while the classes above it have been
+    idle for reserve_idle_s. Slots can be waited for from threads (slot) and from coroutines (aslot);
+    a wait counts against the deadline of the run it belongs to.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, class_limits=None, reserve_idle_s=LLM_RESERVE_IDLE_S):
+        self.max_concurrency = max_concurrency
+        self.reserve_idle_s = reserve_idle_s
+        self.class_limits = {"interactive": max_concurrency, "normal": max_concurrency,
+                             "batch": min(LLM_BATCH_MAX_CONCURRENCY, max_concurrency)}
+        self.class_limits.update(class_limits or {})
+
+        self._lock = threading.Lock()
+        self._queues = {priority: OrderedDict() for priority in PRIORITY_CLASSES}  # tenant -> deque of waiters
+        self._running = dict.fromkeys(PRIORITY_CLASSES, 0)
+        self._completed = dict.fromkeys(PRIORITY_CLASSES, 0)
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITY_CLASSES}
+        self._last_request = dict.fromkeys(PRIORITY_CLASSES, float("-inf"))
+
+    def _enqueue(self, waiter):
+        with self._lock:
+            self._queues[waiter.priority].setdefault(waiter.tenant, deque()).append(waiter)
+            self._last_request[waiter.priority] = waiter.enqueued_at
+            self._dispatch()
+
+    def _limit(self, priority, now):
+        """Slots priority may hold now; called with the lock held."""
+        above = PRIORITY_CLASSES[:PRIORITY_CLASSES.index(priority)]
+        if all(now - self._last_request[p] > self.reserve_idle_s and not self._running[p] for p in above):
+            return self.max_concurrency
+        return self.class_limits[priority]
+
+    def _dispatch(self):
+        """Grants free slots to waiters; called with the lock held."""
+        now = time.monotonic()
+        while sum(self._running.values()) < self.max_concurrency:
+            for priority in PRIORITY_CLASSES:
+                queue = self._queues[priority]
+                if queue and self._running[priority] < self._limit(priority, now):
+                    break
+            else:
+                return
+            # The tenant at the front gets one call, then goes to the back if it has more waiting
+            tenant, waiters = next(iter(queue.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                queue.move_to_end(tenant)
+            else:
+                del queue[tenant]
+            waiter.granted = True
+            self._running[priority] += 1
+            self._waits[priority].append(time.monotonic() - waiter.enqueued_at)
+            waiter.wake()
+
+    def _withdraw(self, waiter):
+        """Takes back a waiter that stopped waiting, releasing its slot if it was granted meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                self._release(waiter.priority, completed=False)
+                return
+            waiters = self._queues[waiter.priority].get(waiter.tenant)
+            if waiters is not None and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._queues[waiter.priority][waiter.tenant]
+
+    def _release(self, priority, completed=True):
+        """Frees a slot; called with the lock held."""
+        self._running[priority] -= 1
+        if completed:
+            self._completed[priority] += 1
+        self._dispatch()
+
+    def _done(self, priority):
+        with self._lock:
+            self._release(priority)
+
+    @contextlib.contextmanager
+    def slot(self, priority=None, tenant=None):
+        """Holds a slot for the code inside; nested slots of the same call pass straight through.
+
+        The call is queued in the class and for the tenant of current_request(priority, tenant).
+        """
+        if _holding.get():
+            yield
+            return
+        waiter = _Waiter(*current_request(priority, tenant))
+        self._enqueue(waiter)
+        try:
+            timeout = deadline.remaining_timeout(None)
+        except deadline.DeadlineExceeded:
+            self._withdraw(waiter)
+            raise
+        if not waiter._event.wait(timeout):
+            self._withdraw(waiter)
+            raise deadline.DeadlineExceeded("Run deadline exceeded while waiting for an LLM slot")
+        token = _holding.set(True)
+        try:
+            yield
+        finally:
+            _holding.reset(token)
+            self._done(waiter.priority)
+
+    @contextlib.asynccontextmanager
+    async def aslot(self, priority=None, tenant=None):
+        if _holding.get():
+            yield
+            return
+        waiter = _Waiter(*current_request(priority, tenant), asyncio.get_running_loop())
+        self._enqueue(waiter)
+        try:
+            # Cancelled by the run's deadline like any other await of the run
+            await waiter._future
+        except BaseException:
+            self._withdraw(waiter)
+            raise
+        token = _holding.set(True)
+        try:
+            yield
+        finally:
+            _holding.reset(token)
+            self._done(waiter.priority)
+
+    def stats(self):
+        with self._lock:
+            result = {}
+            for priority in PRIORITY_CLASSES:
+                waits = sorted(self._waits[priority])
+                result[priority] = {
+                    "limit": self.class_limits[priority],
+                    "running": self._running[priority],
+                    "queued": sum(len(waiters) for waiters in self._queues[priority].values()),
+                    "tenants_queued": len(self._queues[priority]),
+                    "completed": self._completed[priority],
+                    "wait_p50_s": round(statistics.median(waits), 3) if waits else None,
+                    "wait_p95_s": round(waits[min(int(len(waits) * 0.95), len(waits) - 1)], 3) if waits else None,
+                    "wait_max_s": round(waits[-1], 3) if waits else None,
+                }
+            return result
+
+    def print_report(self):
+        for priority, s in self.stats().items():
+            if s["completed"] or s["running"] or s["queued"]:
+                print(f"{priority:<12} {s['completed']:>5} calls, {s['running']} running, {s['queued']} queued, "
+                      f"wait p50 {s['wait_p50_s']}s p95 {s['wait_p95_s']}s max {s['wait_max_s']}s")
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Returns the process-wide scheduler shared by all chat models."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
+
+
+def slot(priority=None, tenant=None):
+    return get_scheduler().slot(priority, tenant)
+
+
+def aslot(priority=None, tenant=None):
+    return get_scheduler().aslot(priority, tenant)
+
+
+def request_headers(priority=None):
+    """Headers that tell the scheduling proxy the class of a model's requests; the process is the tenant.
+
+    They are set once, when the model is created, so the proxy sees the class of the scheduling() block the
+    model was made in, not of the one it is later called in; the in-process slot uses the class at call time.
+    """
+    return {PRIORITY_HEADER: current_request(priority)[0], TENANT_HEADER: f"pid-{os.getpid()}"}
+
+
+@functools.lru_cache(maxsize=None)
+def scheduled(chat_model_class):
+    """A subclass of a LangChain chat model class whose generations wait for a slot of the scheduler.
+
+    scheduling_priority is the class of its calls made outside a scheduling() block.
+    """
+
+    class Scheduled(chat_model_class):
+        scheduling_priority: Optional[str] = None
+
+        def _generate(self, *args, **kwargs):
+            with slot(self.scheduling_priority):
+                return super()._generate(*args, **kwargs)
+
+        async def _agenerate(self, *args, **kwargs):
+            async with aslot(self.scheduling_priority):
+                return await super()._agenerate(*args, **kwargs)
+
+        def _stream(self, *args, **kwargs):
+            with slot(self.scheduling_priority):
+                yield from super()._stream(*args, **kwargs)
+
+        async def _astream(self, *args, **kwargs):
+            async with aslot(self.scheduling_priority):
+                async for chunk in super()._astream(*args, **kwargs):
+                    yield chunk
+
+    Scheduled.__name__ = Scheduled.__qualname__ = f"Scheduled{chat_model_class.__name__}"
+    return Scheduled
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._strip_priority()
+        if self.path == "/scheduler/metrics":
+            body = json.dumps(self.server.scheduler.stats()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self._forward(None)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path_priority = self._strip_priority()
+        if self.path not in SCHEDULED_PATHS:
+            self._forward(body)
+            return
+        priority = self.headers.get(PRIORITY_HEADER, path_priority or self.server.default_priority)
+        if priority not in PRIORITY_CLASSES:
+            priority = self.server.default_priority
+        tenant = self.headers.get(TENANT_HEADER, self.client_address[0])
+        with self.server.scheduler.slot(priority, tenant):
+            self._forward(body)
+
+    def do_DELETE(self):
+        self._strip_priority()
+        self._forward(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def _strip_priority(self):
+        """Removes a /<class> prefix from the path and returns the class, or None without one."""
+        prefix, _, rest = self.path[1:].partition("/")
+        if prefix in PRIORITY_CLASSES:
+            self.path = "/" + rest
+            return prefix
+        return None
+
+    def _forward(self, body):
+        import requests
+
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        try:
+            response = self.server.session.request(self.command, self.server.upstream + self.path, data=body,
+                                                   headers=headers, stream=True, timeout=(10, None))
+        except requests.RequestException as e:
+            self.send_error(502, str(e))
+            return
+        # Ollama streams its answer as NDJSON; the chunks are passed on as they arrive
+        with response:
+            self.send_response(response.status_code)
+            for key, value in response.headers.items():
+                if key.lower() not in HOP_BY_HOP_HEADERS:
+                    self.send_header(key, value)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in response.iter_content(chunk_size=None):
+                if chunk:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=LLM_SCHEDULER_PORT, upstream=None, default_priority=LLM_PRIORITY, scheduler=None):
+    """Starts the scheduling proxy in a background thread; returns the server."""
+    import requests
+
+    from common.ollama_models import OLLAMA_BASE_URL
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), _ProxyHandler)
+    server.daemon_threads = True
+    server.scheduler = scheduler or get_scheduler()
+    server.upstream = (upstream or OLLAMA_BASE_URL).rstrip("/")
+    server.default_priority = default_priority
+    server.session = requests.Session()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Priority-scheduling proxy in front of the shared Ollama server")
+    parser.add_argument("--port", type=int, default=LLM_SCHEDULER_PORT)
+    parser.add_argument("--upstream", help="Ollama server to forward to (default: OLLAMA_BASE_URL)")
+    parser.add_argument("--max-concurrency", type=int, default=LLM_MAX_CONCURRENCY)
+    parser.add_argument("--batch-max-concurrency", type=int, default=LLM_BATCH_MAX_CONCURRENCY)
+    parser.add_argument("--default-priority", choices=PRIORITY_CLASSES, default=LLM_PRIORITY,
+                        help="Class of requests without an X-LLM-Priority header")
+    parser.add_argument("--report-interval", type=float, default=60, help="Seconds between queue reports")
+    args = parser.parse_args()
+
+    scheduler = LLMScheduler(args.max_concurrency, {"batch": args.batch_max_concurrency})
+    server = serve(args.port, args.upstream, args.default_priority, scheduler)
+    print(f"Scheduling LLM requests on port {args.port} for {server.upstream}, "
+          f"{args.max_concurrency} at once, limits {scheduler.class_limits}")
+    try:
+        while True:
+            time.sleep(args.report_interval)
+            scheduler.print_report()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
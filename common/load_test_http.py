@@ -0,0 +1,386 @@
+"""Open-loop HTTP load test for the FastAPI services of this repo.
+
+Starts the chosen app with uvicorn on a free local port, with its upstreams replaced by a local stub server:
+GitHub raw downloads return a small agent whose "LLM call" is a request to the stub's /llm endpoint, which
+answers after --llm-delay-ms. Requests are sent on a fixed schedule at each target rate whether or not
+earlier ones have finished, and latency is measured from the scheduled send time, so a slow server shows
+up as latency instead of a lower request rate.
+
+    python common/load_test_http.py --app mcp-v1 --rps 100 200 400 --output mcp_v1.json
+    python common/load_test_http.py --app mcp-v1 --rps 100 200 400 --compare mcp_v1.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+import psutil
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SERVER_START_TIMEOUT = 120
+RESOURCE_SAMPLE_INTERVAL = 0.5
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+# Distinct queries sent to github-crawler; identical concurrent queries share one graph run there
+CRAWLER_QUERY_VARIETY = 1000
+
+STUB_AGENT_SOURCE = '''import json
+import urllib.request
+
+def custom_agent_function(state):
+    # Stands in for the LLM call of the real agent
+    request = urllib.request.Request("{llm_url}", data=json.dumps(state).encode(), method="POST")
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read())["content"]
+'''
+
+APPS = {
+    "github-crawler": {
+        "dir": "github-crawler",
+        "app": "main:app",
+        "request": lambda i: ("GET", "/query", {"params": {"q": f"query {i % CRAWLER_QUERY_VARIETY}"}}),
+    },
+    "mcp-v1": {
+        "dir": "mcp/v1",
+        "app": "mcp_server:app",
+        "request": lambda i: ("POST", "/mcp", {"json": {"input_text": f"request {i}"}}),
+    },
+    "mcp-v2": {
+        "dir": "mcp/v2",
+        "app": "mcp_server:app",
+        "request": lambda i: ("POST", "/mcp/", {"json": {"input_text": f"request {i}"}}),
+    },
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve_stubs(port, llm_delay, ready):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            # Any raw GitHub file is the stub agent
+            source = STUB_AGENT_SOURCE.format(llm_url=f"http://127.0.0.1:{port}/llm").encode()
+            self._reply(source, "text/plain", {"ETag": '"' + hashlib.sha256(source).hexdigest()[:16] + '"'})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(llm_delay)
+            state = json.loads(body or b"{}")
+            self._reply(json.dumps({"content": f"Stub answer to: {state.get('user_input', '')}"}).encode(),
+                        "application/json")
+
+        def _reply(self, body, content_type, headers=None):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    ready.set()
+    server.serve_forever()
+
+
+def start_stubs(llm_delay):
+    """Runs the stub upstreams in their own process, so they do not compete with the load generator."""
+    port = free_port()
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    process = context.Process(target=_serve_stubs, args=(port, llm_delay, ready), daemon=True)
+    process.start()
+    ready.wait(30)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def start_server(name, workers, stub_url, log_file):
+    app = APPS[name]
+    port = free_port()
+    command = [sys.executable, "-m", "uvicorn", app["app"], "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning", "--backlog", "4096"]
+    env = dict(os.environ, GITHUB_RAW_BASE_URL=stub_url, HTTP_CACHE_DIR=tempfile.mkdtemp(prefix="load-test-http-"))
+    process = subprocess.Popen(command, cwd=REPO_ROOT / app["dir"], env=env, stdout=log_file,
+                               stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited with code {process.returncode} while starting")
+        try:
+            # Any HTTP answer, even a 404, means the server accepts requests
+            httpx.get(base_url + "/", timeout=1)
+            return process, base_url
+        except httpx.TransportError:
+            time.sleep(0.5)
+    process.kill()
+    raise RuntimeError(f"{name} did not start within {SERVER_START_TIMEOUT}s")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=20)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+class ResourceSampler:
+    """Samples the CPU and RSS of a server process and all of its children (workers, agent processes)."""
+
+    def __init__(self, pid, interval=RESOURCE_SAMPLE_INTERVAL):
+        self.root = psutil.Process(pid)
+        self.interval = interval
+        self._processes = {}
+        self._samples = []
+        self._recording = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        try:
+            current = [self.root] + self.root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return None
+        cpu, rss = 0.0, 0
+        for process in current:
+            # cpu_percent() measures since the previous call on the same Process object, so they are kept
+            process = self._processes.setdefault(process.pid, process)
+            try:
+                cpu += process.cpu_percent()
+                rss += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                self._processes.pop(process.pid, None)
+        return cpu, rss
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            sample = self._sample()
+            if sample and self._recording:
+                self._samples.append(sample)
+
+    def start_recording(self):
+        self._samples = []
+        self._recording = True
+
+    def stop_recording(self):
+        self._recording = False
+        samples = self._samples
+        if not samples:
+            return {"cpu_percent_mean": 0.0, "cpu_percent_max": 0.0, "rss_mb_max": 0.0}
+        return {
+            "cpu_percent_mean": round(statistics.mean(cpu for cpu, _ in samples), 1),
+            "cpu_percent_max": round(max(cpu for cpu, _ in samples), 1),
+            "rss_mb_max": round(max(rss for _, rss in samples) / 2 ** 20, 1),
+        }
+
+    def close(self):
+        self._stop_event.set()
+        self._thread.join()
+
+
+async def drive(client, name, rps, duration, record):
+    """Sends rps * duration requests on a fixed schedule; record(i, latency, error) is called for each."""
+    build_request = APPS[name]["request"]
+    loop = asyncio.get_running_loop()
+    interval = 1 / rps
+    send_lags = []
+
+    async def send(i, scheduled):
+        method, path, kwargs = build_request(i)
+        error = None
+        try:
+            response = await client.request(method, path, **kwargs)
+            if response.status_code >= 400:
+                error = str(response.status_code)
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        record(i, loop.time() - scheduled, error)
+
+    tasks = []
+    start = loop.time() + 0.01
+    for i in range(int(rps * duration)):
+        scheduled = start + i * interval
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # How far behind schedule the generator itself is; large values mean the client is the bottleneck
+        send_lags.append(max(loop.time() - scheduled, 0.0))
+        tasks.append(asyncio.create_task(send(i, scheduled)))
+    await asyncio.gather(*tasks)
+    return loop.time() - start, max(send_lags, default=0.0)
+
+
+def summarize(latencies, errors, sent, elapsed):
+    latencies.sort()
+    histogram = {f"le_{bound}ms": 0 for bound in HISTOGRAM_BUCKETS_MS}
+    histogram["inf"] = 0
+    for latency in latencies:
+        latency_ms = latency * 1000
+        bound = next((b for b in HISTOGRAM_BUCKETS_MS if latency_ms <= b), None)
+        histogram[f"le_{bound}ms" if bound else "inf"] += 1
+    error_count = sum(errors.values())
+    return {
+        "sent": sent,
+        "ok": sent - error_count,
+        "errors": errors,
+        "error_rate": round(error_count / sent, 4) if sent else 0.0,
+        "achieved_rps": round(sent / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        "histogram": histogram,
+    }
+
+
+async def run_steps(name, base_url, rates, duration, warmup, timeout, max_connections, sampler):
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        steps = []
+        for rps in rates:
+            if warmup:
+                await drive(client, name, rps, warmup, lambda *args: None)
+
+            # Latencies of failed requests are left out of the percentiles but counted in the errors
+            latencies, errors = [], {}
+
+            def record(i, latency, error):
+                if error:
+                    errors[error] = errors.get(error, 0) + 1
+                else:
+                    latencies.append(latency)
+
+            sampler.start_recording()
+            elapsed, max_send_lag = await drive(client, name, rps, duration, record)
+            step = {"target_rps": rps, **summarize(latencies, errors, int(rps * duration), elapsed),
+                    "max_send_lag_ms": round(max_send_lag * 1000, 2), "server": sampler.stop_recording()}
+            steps.append(step)
+            latency = step["latency_ms"]
+            print(f"  {rps:>6} rps: achieved {step['achieved_rps']:>7.1f}, p50 {latency['p50']:8.2f} ms, "
+                  f"p95 {latency['p95']:8.2f} ms, p99 {latency['p99']:8.2f} ms, errors {step['error_rate']:.2%}, "
+                  f"cpu {step['server']['cpu_percent_mean']:.0f}%, rss {step['server']['rss_mb_max']:.0f} MB")
+        return steps
+
+
+def load_test_app(name, rates, duration, warmup, workers, timeout, max_connections, stub_url):
+    print(f"{name}:")
+    with tempfile.NamedTemporaryFile(prefix=f"load-test-{name}-", suffix=".log", delete=False) as log_file:
+        try:
+            process, base_url = start_server(name, workers, stub_url, log_file)
+        except RuntimeError as e:
+            log_file.flush()
+            print(f"  {e}; server log {log_file.name}:")
+            print("    " + "\n    ".join(Path(log_file.name).read_text(errors="replace").splitlines()[-10:]))
+            return {"error": str(e)}
+
+        sampler = ResourceSampler(process.pid)
+        try:
+            steps = asyncio.run(run_steps(name, base_url, rates, duration, warmup, timeout, max_connections,
+                                          sampler))
+        finally:
+            sampler.close()
+            stop_server(process)
+    return {"workers": workers, "steps": steps}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Prints the change of every metric against a previous results file, per app and target rate."""
+    print(f"\nCompared with {baseline.get('git_commit')} ({baseline.get('started_at')}):")
+    for name, result in results["apps"].items():
+        baseline_steps = {step["target_rps"]: step for step in baseline.get("apps", {}).get(name, {}).get("steps", [])}
+        for step in result.get("steps", []):
+            before = baseline_steps.get(step["target_rps"])
+            if before is None:
+                continue
+            changes = []
+            for label, key in (("p50", "p50"), ("p95", "p95"), ("p99", "p99")):
+                old, new = before["latency_ms"][key], step["latency_ms"][key]
+                changes.append(f"{label} {old:.1f}->{new:.1f} ms ({(new - old) / old:+.0%})" if old
+                               else f"{label} {new:.1f} ms")
+            changes.append(f"errors {before['error_rate']:.2%}->{step['error_rate']:.2%}")
+            changes.append(f"cpu {before['server']['cpu_percent_mean']:.0f}->{step['server']['cpu_percent_mean']:.0f}%")
+            print(f"  {name} @ {step['target_rps']} rps: " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop HTTP load test of the repo's FastAPI services")
+    parser.add_argument("--app", nargs="+", choices=sorted(APPS), default=sorted(APPS))
+    parser.add_argument("--rps", nargs="+", type=float, default=[50, 100, 200], help="Target request rates")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds measured per rate")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds sent before each rate, not measured")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--timeout", type=float, default=30, help="Request timeout in seconds")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--llm-delay-ms", type=float, default=50, help="Latency of the stub LLM")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to compare with")
+    args = parser.parse_args()
+
+    stubs, stub_url = start_stubs(args.llm_delay_ms / 1000)
+    results = {
+        "git_commit": git_commit(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"rps": args.rps, "duration_s": args.duration, "warmup_s": args.warmup,
+                   "llm_delay_ms": args.llm_delay_ms, "cpu_count": os.cpu_count()},
+        "apps": {},
+    }
+    try:
+        for name in args.app:
+            results["apps"][name] = load_test_app(name, args.rps, args.duration, args.warmup, args.workers,
+                                                  args.timeout, args.max_connections, stub_url)
+    finally:
+        stubs.terminate()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+import statistics
+import threading
+import time
+from collections import deque
+
+from pydantic import Field, create_model
+
+from common.deadline import DeadlineExceeded
+
+SMALL_MODEL = os.environ.get("CASCADE_SMALL_MODEL", "phi")
+LARGE_MODEL = os.environ.get("CASCADE_LARGE_MODEL", "llama3.1:8b")
+# Answers of a cheaper model with a lower self-reported confidence go to the next model
+MIN_CONFIDENCE = float(os.environ.get("CASCADE_MIN_CONFIDENCE", "0.7"))
+# Latencies kept per step for the median; older ones are dropped
+LATENCY_SAMPLES = 1000
+
+_cascades = []
+
+
+def step_models(step, default=(SMALL_MODEL, LARGE_MODEL)):
+    """Models a step tries in order; MODELS_<STEP> overrides them, e.g. MODELS_GRADE_ANSWER=llama3.1:8b."""
+    value = os.environ.get("MODELS_" + step.upper())
+    return tuple(m for m in value.split(",") if m) if value else tuple(default)
+
+
+def with_confidence(schema):
+    """The schema with an extra confidence field the model fills in, used to decide whether to escalate."""
+    return create_model(
+        schema.__name__,
+        __base__=schema,
+        __doc__=schema.__doc__,
+        confidence=(float, Field(description="How sure you are of this answer, from 0 to 1", ge=0, le=1)),
+    )
+
+
+class ModelCascade:
+    """Runs a classification step on the cheapest model first and escalates only when needed.
+
+    build(model) returns a runnable (invoke/ainvoke) for the step on that model; it is built on first use.
+    An answer is accepted when it parses, passes validate(result) and, if it has a confidence field, is at
+    least min_confidence sure. Otherwise, or when the call fails, the next model is asked; the last model's
+    answer (or error) is returned as it is. A run out of time is not escalated. Every call is recorded per
+    model, so print_report() shows how often each step escalated.
+    """
+
+    def __init__(self, step, build, models=None, validate=None, min_confidence=MIN_CONFIDENCE):
+        self.step = step
+        self.models = tuple(models) if models else step_models(step)
+        self.validate = validate
+        self.min_confidence = min_confidence
+        self._build = build
+        self._runnables = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "answered_by": {}, "escalations": {}, "latencies": deque(maxlen=LATENCY_SAMPLES)}
+        _cascades.append(self)
+
+    def _runnable(self, model):
+        with self._lock:
+            if model not in self._runnables:
+                self._runnables[model] = self._build(model)
+            return self._runnables[model]
+
+    def _rejection(self, result):
+        if result is None:
+            return "invalid"
+        if self.validate is not None and not self.validate(result):
+            return "invalid"
+        confidence = getattr(result, "confidence", None)
+        if confidence is not None and confidence < self.min_confidence:
+            return "low_confidence"
+        return None
+
+    def invoke(self, inputs):
+        start = time.perf_counter()
+        for i, model in enumerate(self.models):
+            last = i == len(self.models) - 1
+            try:
+                result = self._runnable(model).invoke(inputs)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                # Output that does not parse into the schema, or a model that cannot answer at all
+                if last:
+                    raise
+                self._escalated(model, _failure(e))
+                continue
+            reason = self._rejection(result)
+            if reason is None or last:
+                self._answered(model, time.perf_counter() - start)
+                return result
+            self._escalated(model, reason)
+
+    async def ainvoke(self, inputs):
+        start = time.perf_counter()
+        for i, model in enumerate(self.models):
+            last = i == len(self.models) - 1
+            try:
+                result = await self._runnable(model).ainvoke(inputs)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if last:
+                    raise
+                self._escalated(model, _failure(e))
+                continue
+            reason = self._rejection(result)
+            if reason is None or last:
+                self._answered(model, time.perf_counter() - start)
+                return result
+            self._escalated(model, reason)
+
+    def _escalated(self, model, reason):
+        with self._lock:
+            key = f"{model}:{reason}"
+            self._stats["escalations"][key] = self._stats["escalations"].get(key, 0) + 1
+
+    def _answered(self, model, latency):
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["answered_by"][model] = self._stats["answered_by"].get(model, 0) + 1
+            self._stats["latencies"].append(latency)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "calls": self._stats["calls"],
+                "answered_by": dict(self._stats["answered_by"]),
+                "escalations": dict(self._stats["escalations"]),
+            }
+            latencies = list(self._stats["latencies"])
+        stats["latency_p50_s"] = round(statistics.median(latencies), 3) if latencies else None
+        return stats
+
+
+def _failure(error):
+    # OutputParserException and ValidationError are ValueErrors
+    return "invalid" if isinstance(error, ValueError) else "error"
+
+
+def print_report():
+    for cascade in _cascades:
+        s = cascade.stats()
+        if s["calls"]:
+            print(f"{cascade.step:<16} {s['calls']:>4} calls, answered by {s['answered_by']}, "
+                  f"escalations {s['escalations']}, p50 {s['latency_p50_s']}s")
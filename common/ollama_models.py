@@ -0,0 +1,319 @@
+import argparse
+import os
+import statistics
+import threading
+import time
+from collections import deque
+
+import requests
+
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+# Models used across the repo; the CLI below measures them, a process preloads the ones it asks for
+OLLAMA_MODELS = tuple(m for m in os.environ.get("OLLAMA_MODELS", "mistral,phi,llama3.1:8b").split(",") if m)
+# Extra models to load at process start even before a script asks for them
+OLLAMA_PRELOAD_MODELS = tuple(m for m in os.environ.get("OLLAMA_PRELOAD_MODELS", "").split(",") if m)
+# How long Ollama keeps a model in memory after its last request: a duration such as "30m", or -1 for ever
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# Memory the loaded models may use together, in MB; 0 leaves eviction to Ollama
+OLLAMA_MEMORY_BUDGET_MB = float(os.environ.get("OLLAMA_MEMORY_BUDGET_MB", "0"))
+# Calls within this many seconds decide which models stay loaded under the memory budget
+CALL_FREQUENCY_WINDOW = 15 * 60
+REBALANCE_INTERVAL = 60
+# A call whose model load took longer than this, in seconds, counts as cold
+COLD_LOAD_THRESHOLD = 0.5
+LOAD_TIMEOUT = 300
+# Latencies kept per model and kind for the medians; older ones are dropped
+LATENCY_SAMPLES = 1000
+
+
+def _full_name(model):
+    return model if ":" in model else model + ":latest"
+
+
+class OllamaModelManager:
+    """Keeps the Ollama models of a process loaded and measures what the first call to a model costs.
+
+    Models are loaded in a background thread as soon as a script asks for them, every request is sent
+    with keep_alive so Ollama does not unload them between calls, and models Ollama evicted anyway are
+    loaded again. With a memory budget, the models called most often in the last CALL_FREQUENCY_WINDOW
+    seconds stay loaded and the others are unloaded. Chat models created by chat_model() report every
+    call, split into cold (the model had to be loaded) and warm.
+    """
+
+    def __init__(self, base_url=OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE, memory_budget_mb=OLLAMA_MEMORY_BUDGET_MB,
+                 preload=OLLAMA_PRELOAD_MODELS, window=CALL_FREQUENCY_WINDOW):
+        self.base_url = base_url.rstrip("/")
+        self.keep_alive = keep_alive
+        self.memory_budget_mb = memory_budget_mb
+        self.window = window
+        self.session = requests.Session()
+
+        self._lock = threading.Lock()
+        self._models = list(dict.fromkeys(preload))
+        self._calls = {}  # model -> deque of call times
+        self._latencies = {}  # model -> {"cold": deque, "warm": deque} of recent latencies
+        self._counts = {}  # model -> {"cold": n, "warm": n}, all calls
+        self._sizes = {}  # model -> MB it used when it was last loaded
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._callback = None
+
+    def track(self, model):
+        """Adds a model to the ones kept loaded and starts loading it in the background."""
+        with self._lock:
+            if model in self._models:
+                return
+            self._models.append(model)
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ollama-models", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.rebalance()
+            except requests.RequestException as e:
+                print(f"Ollama model manager: {e}")
+            self._wake.wait(REBALANCE_INTERVAL)
+            self._wake.clear()
+
+    def loaded(self):
+        """Models Ollama has in memory now, with their size in MB."""
+        response = self.session.get(f"{self.base_url}/api/ps", timeout=10)
+        response.raise_for_status()
+        return {m["name"]: m.get("size", 0) / 2 ** 20 for m in response.json().get("models", [])}
+
+    def load(self, model):
+        """Loads a model without generating anything; returns the seconds Ollama spent loading it."""
+        response = self.session.post(f"{self.base_url}/api/generate",
+                                     json={"model": model, "keep_alive": self.keep_alive}, timeout=LOAD_TIMEOUT)
+        response.raise_for_status()
+        load_duration = response.json().get("load_duration", 0) / 1e9
+        size = self.loaded().get(_full_name(model))
+        if size:
+            with self._lock:
+                self._sizes[model] = size
+        print(f"Ollama model {model} loaded in {load_duration:.2f}s")
+        return load_duration
+
+    def unload(self, model):
+        response = self.session.post(f"{self.base_url}/api/generate", json={"model": model, "keep_alive": 0},
+                                     timeout=60)
+        response.raise_for_status()
+        print(f"Ollama model {model} unloaded")
+
+    def recent_calls(self, model, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            calls = self._calls.get(model, ())
+            while calls and calls[0] < now - self.window:
+                calls.popleft()
+            return len(calls)
+
+    def resident_models(self):
+        """The models that should be loaded: all of them, or under a budget the most called that fit."""
+        with self._lock:
+            models = list(self._models)
+            last_call = {model: calls[-1] if calls else 0.0 for model, calls in self._calls.items()}
+            sizes = dict(self._sizes)
+        if not self.memory_budget_mb:
+            return models
+
+        now = time.monotonic()
+        ranked = sorted(models, key=lambda m: (self.recent_calls(m, now), last_call.get(m, 0.0)), reverse=True)
+        keep, used = [], 0.0
+        for model in ranked:
+            # A model that was never loaded has no known size yet; it is loaded and measured first
+            size = sizes.get(model, 0.0)
+            if used + size <= self.memory_budget_mb:
+                keep.append(model)
+                used += size
+        return keep
+
+    def rebalance(self):
+        loaded = self.loaded()
+        with self._lock:
+            managed = {_full_name(m): m for m in self._models}
+            for name, size in loaded.items():
+                if name in managed and size:
+                    self._sizes[managed[name]] = size
+        keep = self.resident_models()
+        # One model failing to load or unload (e.g. it is not pulled) must not stop the others
+        if self.memory_budget_mb:
+            for name in loaded:
+                if name in managed and managed[name] not in keep:
+                    try:
+                        self.unload(managed[name])
+                    except requests.RequestException as e:
+                        print(f"Ollama model manager: could not unload {managed[name]}: {e}")
+        for model in keep:
+            if _full_name(model) not in loaded:
+                try:
+                    self.load(model)
+                except requests.RequestException as e:
+                    print(f"Ollama model manager: could not load {model}: {e}")
+
+    def record_call(self, model, latency, load_duration=0.0):
+        with self._lock:
+            self._calls.setdefault(model, deque()).append(time.monotonic())
+            kind = "cold" if load_duration >= COLD_LOAD_THRESHOLD else "warm"
+            by_kind = self._latencies.setdefault(
+                model, {"cold": deque(maxlen=LATENCY_SAMPLES), "warm": deque(maxlen=LATENCY_SAMPLES)})
+            by_kind[kind].append(latency)
+            counts = self._counts.setdefault(model, {"cold": 0, "warm": 0})
+            counts[kind] += 1
+        if self.memory_budget_mb and model not in self.resident_models():
+            # A call to an unloaded model loads it; let the background thread restore the budget
+            self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            latencies = {model: {kind: list(values) for kind, values in by_kind.items()}
+                         for model, by_kind in self._latencies.items()}
+            counts = {model: dict(by_kind) for model, by_kind in self._counts.items()}
+        return {
+            model: {
+                "recent_calls": self.recent_calls(model),
+                "cold_calls": counts[model]["cold"],
+                "warm_calls": counts[model]["warm"],
+                "cold_p50_s": round(statistics.median(by_kind["cold"]), 3) if by_kind["cold"] else None,
+                "warm_p50_s": round(statistics.median(by_kind["warm"]), 3) if by_kind["warm"] else None,
+            }
+            for model, by_kind in latencies.items()
+        }
+
+    def print_report(self):
+        for model, s in self.stats().items():
+            cold = f"p50 {s['cold_p50_s']:.3f}s" if s["cold_calls"] else "-"
+            warm = f"p50 {s['warm_p50_s']:.3f}s" if s["warm_calls"] else "-"
+            print(f"{model:<16} {s['cold_calls']:>4} cold calls ({cold}), {s['warm_calls']:>4} warm calls ({warm})")
+
+    @property
+    def callback(self):
+        if self._callback is None:
+            self._callback = _make_latency_callback(self)
+        return self._callback
+
+    def chat_model(self, model, timeout=None, priority=None, **kwargs):
+        """A ChatOllama for model that is preloaded, kept alive and reports its call latencies.
+
+        Its generations wait for a slot of the process's LLM scheduler, in the priority class of the
+        llm_scheduler.scheduling() block they run in, else in priority. timeout, in seconds, is the HTTP
+        client's: it bounds each connect and read, not the whole generation (see deadline.bounded for that).
+        """
+        from langchain_ollama import ChatOllama
+
+        from common import llm_scheduler
+
+        self.track(model)
+        client_kwargs = dict(kwargs.pop("client_kwargs", {}))
+        # When OLLAMA_BASE_URL points at the scheduling proxy, it orders the requests by these headers
+        client_kwargs["headers"] = {**llm_scheduler.request_headers(priority), **client_kwargs.get("headers", {})}
+        if timeout is not None:
+            client_kwargs["timeout"] = timeout
+        return llm_scheduler.scheduled(ChatOllama)(model=model, base_url=self.base_url, keep_alive=self.keep_alive,
+                                                   callbacks=[self.callback], client_kwargs=client_kwargs,
+                                                   scheduling_priority=priority, **kwargs)
+
+    def embeddings(self, model, **kwargs):
+        from langchain_ollama import OllamaEmbeddings
+
+        self.track(model)
+        return OllamaEmbeddings(model=model, base_url=self.base_url, keep_alive=self.keep_alive, **kwargs)
+
+    def close(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def _make_latency_callback(manager):
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LatencyCallback(BaseCallbackHandler):
+        """Times each ChatOllama call; Ollama reports in load_duration how long it had to load the model."""
+
+        def __init__(self):
+            self._started = {}
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            model = (kwargs.get("invocation_params") or {}).get("model") or (kwargs.get("metadata") or {}).get(
+                "ls_model_name")
+            self._started[run_id] = (model, time.perf_counter())
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            model, start = self._started.pop(run_id, (None, None))
+            if model is None:
+                return
+            info = (response.generations[0][0].generation_info or {}) if response.generations else {}
+            manager.record_call(model, time.perf_counter() - start, info.get("load_duration", 0) / 1e9)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._started.pop(run_id, None)
+
+    return LatencyCallback()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_model_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = OllamaModelManager().start()
+        return _manager
+
+
+def chat_model(model, **kwargs):
+    return get_model_manager().chat_model(model, **kwargs)
+
+
+def embeddings(model, **kwargs):
+    return get_model_manager().embeddings(model, **kwargs)
+
+
+def measure_cold_and_warm(manager, model, warm_calls):
+    """Unloads model, then times one short generation from cold and warm_calls more with it loaded."""
+    if warm_calls < 1:
+        raise ValueError(f"warm_calls must be at least 1, got {warm_calls}")
+    manager.unload(model)
+    timings = []
+    for _ in range(warm_calls + 1):
+        start = time.perf_counter()
+        response = manager.session.post(f"{manager.base_url}/api/generate", json={
+            "model": model, "prompt": "Say hi.", "stream": False, "keep_alive": manager.keep_alive,
+            "options": {"num_predict": 1},
+        }, timeout=LOAD_TIMEOUT)
+        response.raise_for_status()
+        timings.append((time.perf_counter() - start, response.json().get("load_duration", 0) / 1e9))
+    cold, warm = timings[0], timings[1:]
+    print(f"{model:<16} cold {cold[0]:7.2f}s (load {cold[1]:6.2f}s), "
+          f"warm p50 {statistics.median(t for t, _ in warm):6.3f}s (load {max(l for _, l in warm):6.3f}s max)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold and warm latency of the Ollama models")
+    parser.add_argument("--models", nargs="+", default=list(OLLAMA_MODELS))
+    parser.add_argument("--warm-calls", type=int, default=5)
+    args = parser.parse_args()
+    if args.warm_calls < 1:
+        parser.error("--warm-calls must be at least 1")
+
+    manager = OllamaModelManager(preload=())
+    for model in args.models:
+        measure_cold_and_warm(manager, model, args.warm_calls)
+    print("Loaded now:", ", ".join(f"{name} ({size:.0f} MB)" for name, size in manager.loaded().items()))
+
+
+if __name__ == "__main__":
+    main()
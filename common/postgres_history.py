@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from psycopg import Connection
+from psycopg.rows import dict_row
+from psycopg.types.json import Jsonb
+from psycopg_pool import ConnectionPool
+
+SETUP_SQL = """
+CREATE TABLE IF NOT EXISTS history_items (
+    namespace TEXT NOT NULL,
+    seq BIGSERIAL NOT NULL,
+    value JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (namespace, seq)
+)
+"""
+
+
+def _namespace_key(namespace: Tuple[str, ...]) -> str:
+    # Same encoding as the namespace column of langgraph's PostgresStore
+    return ".".join(namespace)
+
+
+class PostgresHistory:
+    """Append-only, per-namespace history stored as one row per item.
+
+    Appends are a single INSERT, so their cost does not depend on the history length and concurrent writers
+    never overwrite each other. Items are ordered by a database sequence and can be read page by page or as
+    the last N items. It can share the connection (or pool) of a PostgresStore: PostgresHistory(store.conn).
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @classmethod
+    @contextmanager
+    def from_conn_string(cls, conn_string: str) -> Iterator["PostgresHistory"]:
+        with Connection.connect(conn_string, autocommit=True, prepare_threshold=0, row_factory=dict_row) as conn:
+            yield cls(conn)
+
+    @contextmanager
+    def _cursor(self):
+        if isinstance(self.conn, ConnectionPool):
+            with self.conn.connection() as conn:
+                with conn.cursor(row_factory=dict_row) as cur:
+                    yield cur
+        else:
+            with self.conn.cursor(row_factory=dict_row) as cur:
+                yield cur
+
+    def setup(self) -> None:
+        with self._cursor() as cur:
+            cur.execute(SETUP_SQL)
+
+    def append(self, namespace: Tuple[str, ...], value: Any) -> int:
+        """Appends one item and returns its sequence number."""
+        with self._cursor() as cur:
+            cur.execute(
+                "INSERT INTO history_items (namespace, value) VALUES (%s, %s) RETURNING seq",
+                (_namespace_key(namespace), Jsonb(value)),
+            )
+            return cur.fetchone()["seq"]
+
+    def extend(self, namespace: Tuple[str, ...], values: Iterable[Any]) -> None:
+        with self._cursor() as cur:
+            cur.executemany(
+                "INSERT INTO history_items (namespace, value) VALUES (%s, %s)",
+                [(_namespace_key(namespace), Jsonb(value)) for value in values],
+            )
+
+    def last(self, namespace: Tuple[str, ...], n: int) -> List[Any]:
+        """Returns the last n items, oldest first."""
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT value FROM history_items WHERE namespace = %s ORDER BY seq DESC LIMIT %s",
+                (_namespace_key(namespace), n),
+            )
+            rows = cur.fetchall()
+        return [row["value"] for row in reversed(rows)]
+
+    def page(self, namespace: Tuple[str, ...], after: int = 0, limit: int = 100) -> Tuple[List[Any], Optional[int]]:
+        """Returns up to limit items with a sequence number greater than after, plus the cursor for the next page.
+
+        The cursor is None when there are no more items.
+        """
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT seq, value FROM history_items WHERE namespace = %s AND seq > %s ORDER BY seq LIMIT %s",
+                (_namespace_key(namespace), after, limit),
+            )
+            rows = cur.fetchall()
+        next_cursor = rows[-1]["seq"] if len(rows) == limit else None
+        return [row["value"] for row in rows], next_cursor
+
+    def since(self, namespace: Tuple[str, ...], after: int = 0) -> Tuple[List[Any], int]:
+        """Returns the items with a sequence number greater than after and the sequence number of the last one."""
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT seq, value FROM history_items WHERE namespace = %s AND seq > %s ORDER BY seq",
+                (_namespace_key(namespace), after),
+            )
+            rows = cur.fetchall()
+        return [row["value"] for row in rows], rows[-1]["seq"] if rows else after
+
+    def last_seq(self, namespace: Tuple[str, ...]) -> int:
+        """Returns the highest sequence number of the namespace, 0 when it is empty; an index-only lookup."""
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT coalesce(max(seq), 0) AS seq FROM history_items WHERE namespace = %s",
+                (_namespace_key(namespace),),
+            )
+            return cur.fetchone()["seq"]
+
+    def count(self, namespace: Tuple[str, ...]) -> int:
+        with self._cursor() as cur:
+            cur.execute("SELECT count(*) AS n FROM history_items WHERE namespace = %s", (_namespace_key(namespace),))
+            return cur.fetchone()["n"]
@@ -0,0 +1,431 @@
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import weakref
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.store.base import BaseStore, GetOp, Item, ListNamespacesOp, PutOp, SearchItem, SearchOp
+
+SQLITE_URI_PREFIX = "sqlite:///"
+BUSY_TIMEOUT_MS = 5000
+# Writes queued while a transaction is being committed are committed together, up to this many
+MAX_WRITE_BATCH = 256
+
+STORE_SETUP_SQL = """
+CREATE TABLE IF NOT EXISTS store (
+    prefix TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (prefix, key)
+)
+"""
+
+HISTORY_SETUP_SQL = """
+CREATE TABLE IF NOT EXISTS history_items (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS history_items_namespace_seq ON history_items (namespace, seq);
+"""
+
+
+def is_sqlite_uri(uri: str) -> bool:
+    return uri.startswith(SQLITE_URI_PREFIX)
+
+
+def sqlite_path(uri: str) -> str:
+    """sqlite:///relative/path.db or sqlite:////absolute/path.db -> file path."""
+    return uri[len(SQLITE_URI_PREFIX):]
+
+
+def _namespace_key(namespace: Tuple[str, ...]) -> str:
+    # Same encoding as the prefix/namespace columns of the Postgres tables
+    return ".".join(namespace)
+
+
+class SQLiteDatabase:
+    """An SQLite file in WAL mode shared by the embedded store, history and checkpointer.
+
+    Every thread reads through its own connection, closed when the thread exits, so reads never wait on each
+    other or on a writer. Writes
+    are functions run by a single writer thread: everything queued while the previous transaction commits
+    goes into the next one, and each write has its own savepoint so a failing write does not undo the others.
+    """
+
+    def __init__(self, path: str, max_write_batch: int = MAX_WRITE_BATCH):
+        self.path = path
+        self.max_write_batch = max_write_batch
+
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._writes = queue.Queue()
+        self._closed = False
+
+        self.commits = 0
+        self.writes_committed = 0
+
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+    @classmethod
+    @contextmanager
+    def from_uri(cls, uri: str) -> Iterator["SQLiteDatabase"]:
+        db = cls(sqlite_path(uri))
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Transactions are managed explicitly (BEGIN in the writer), reads run in autocommit mode
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode commits only append to the log; the fsync happens at checkpoints
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            # The thread's locals are dropped when it exits, and the connection is closed with them
+            self._local.owner = _ConnectionOwner()
+            weakref.finalize(self._local.owner, self._release, conn)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        with self._connections_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
+    def write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Runs fn(conn) in the writer thread and returns its result once the transaction is committed."""
+        if self._closed:
+            raise RuntimeError("The SQLite database is closed")
+        future = Future()
+        self._writes.put((fn, future))
+        return future.result()
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        while True:
+            item = self._writes.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.max_write_batch:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._writes.put(None)
+                    break
+                batch.append(item)
+
+            results = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for fn, future in batch:
+                    conn.execute("SAVEPOINT write")
+                    try:
+                        results.append((future, fn(conn), None))
+                        conn.execute("RELEASE write")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO write")
+                        conn.execute("RELEASE write")
+                        results.append((future, None, e))
+                conn.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.commits += 1
+            self.writes_committed += len(batch)
+            for future, result, error in results:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._writes.put(None)
+        self._writer.join()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+class _ConnectionOwner:
+    """Stored next to a thread's connection; it is collected when the thread exits."""
+
+
+class SQLiteStore(BaseStore):
+    """Embedded replacement for langgraph's PostgresStore: items by namespace and key, values stored as JSON.
+
+    Supports get, put, delete, search by namespace prefix with equality filters, and list_namespaces.
+    Semantic search is not supported: an index config is rejected here and a search query by search().
+    """
+
+    def __init__(self, db: SQLiteDatabase, *, index=None):
+        if index is not None:
+            raise ValueError("SQLiteStore does not support semantic search, use PostgresStore for an index")
+        self.db = db
+
+    @classmethod
+    @contextmanager
+    def from_conn_string(cls, conn_string: str) -> Iterator["SQLiteStore"]:
+        with SQLiteDatabase.from_uri(conn_string) as db:
+            yield cls(db)
+
+    def setup(self) -> None:
+        self.db.connection().execute(STORE_SETUP_SQL)
+
+    def batch(self, ops: Iterable[Any]) -> List[Any]:
+        ops = list(ops)
+        results = [None] * len(ops)
+
+        # Puts for the same item within one batch: the last one wins, as with PostgresStore
+        puts = {}
+        for i, op in enumerate(ops):
+            if isinstance(op, PutOp):
+                puts[(op.namespace, op.key)] = op
+            elif isinstance(op, GetOp):
+                results[i] = self._get(op)
+            elif isinstance(op, SearchOp):
+                results[i] = self._search(op)
+            elif isinstance(op, ListNamespacesOp):
+                results[i] = self._list_namespaces(op)
+            else:
+                raise ValueError(f"Unknown store operation: {op}")
+
+        if puts:
+            self.db.write(lambda conn: self._apply_puts(conn, puts.values()))
+        return results
+
+    async def abatch(self, ops: Iterable[Any]) -> List[Any]:
+        return await asyncio.to_thread(self.batch, ops)
+
+    def _get(self, op: GetOp) -> Optional[Item]:
+        row = self.db.connection().execute(
+            "SELECT value, created_at, updated_at FROM store WHERE prefix = ? AND key = ?",
+            (_namespace_key(op.namespace), op.key),
+        ).fetchone()
+        if row is None:
+            return None
+        value, created_at, updated_at = row
+        return Item(value=json.loads(value), key=op.key, namespace=op.namespace,
+                    created_at=datetime.fromisoformat(created_at), updated_at=datetime.fromisoformat(updated_at))
+
+    def _search(self, op: SearchOp) -> List[SearchItem]:
+        if op.query:
+            raise ValueError("SQLiteStore does not support semantic search queries, search with filter= only")
+        prefix = _namespace_key(op.namespace_prefix)
+        rows = self.db.connection().execute(
+            "SELECT prefix, key, value, created_at, updated_at FROM store "
+            "WHERE prefix = ? OR prefix LIKE ? ESCAPE '\\' ORDER BY updated_at DESC",
+            (prefix, prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + ".%"),
+        ).fetchall()
+
+        items = []
+        for namespace, key, value, created_at, updated_at in rows:
+            value = json.loads(value)
+            if op.filter and any(value.get(field) != expected for field, expected in op.filter.items()):
+                continue
+            items.append(SearchItem(namespace=tuple(namespace.split(".")), key=key, value=value,
+                                    created_at=datetime.fromisoformat(created_at),
+                                    updated_at=datetime.fromisoformat(updated_at)))
+        return items[op.offset:op.offset + op.limit]
+
+    def _list_namespaces(self, op: ListNamespacesOp) -> List[Tuple[str, ...]]:
+        rows = self.db.connection().execute("SELECT DISTINCT prefix FROM store ORDER BY prefix").fetchall()
+        namespaces = []
+        for (prefix,) in rows:
+            namespace = tuple(prefix.split("."))
+            if not all(self._matches(namespace, condition) for condition in op.match_conditions or ()):
+                continue
+            if op.max_depth is not None:
+                namespace = namespace[:op.max_depth]
+            if namespace not in namespaces:
+                namespaces.append(namespace)
+        return namespaces[op.offset:op.offset + op.limit]
+
+    @staticmethod
+    def _matches(namespace: Tuple[str, ...], condition) -> bool:
+        path = tuple(condition.path)
+        part = namespace[:len(path)] if condition.match_type == "prefix" else namespace[-len(path):]
+        return len(part) == len(path) and all(p == "*" or p == n for p, n in zip(path, part))
+
+    @staticmethod
+    def _apply_puts(conn: sqlite3.Connection, puts: Iterable[PutOp]) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        for op in puts:
+            if op.value is None:
+                conn.execute("DELETE FROM store WHERE prefix = ? AND key = ?", (_namespace_key(op.namespace), op.key))
+            else:
+                conn.execute(
+                    "INSERT INTO store (prefix, key, value, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (prefix, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                    (_namespace_key(op.namespace), op.key, json.dumps(op.value), now, now),
+                )
+
+
+class SQLiteHistory:
+    """Embedded counterpart of common.postgres_history.PostgresHistory, with the same methods."""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def setup(self) -> None:
+        self.db.connection().executescript(HISTORY_SETUP_SQL)
+
+    def append(self, namespace: Tuple[str, ...], value: Any) -> int:
+        """Appends one item and returns its sequence number."""
+        return self.db.write(lambda conn: conn.execute(
+            "INSERT INTO history_items (namespace, value) VALUES (?, ?)",
+            (_namespace_key(namespace), json.dumps(value)),
+        ).lastrowid)
+
+    def extend(self, namespace: Tuple[str, ...], values: Iterable[Any]) -> None:
+        rows = [(_namespace_key(namespace), json.dumps(value)) for value in values]
+        self.db.write(lambda conn: conn.executemany("INSERT INTO history_items (namespace, value) VALUES (?, ?)", rows))
+
+    def last(self, namespace: Tuple[str, ...], n: int) -> List[Any]:
+        """Returns the last n items, oldest first."""
+        rows = self.db.connection().execute(
+            "SELECT value FROM history_items WHERE namespace = ? ORDER BY seq DESC LIMIT ?",
+            (_namespace_key(namespace), n),
+        ).fetchall()
+        return [json.loads(value) for (value,) in reversed(rows)]
+
+    def page(self, namespace: Tuple[str, ...], after: int = 0, limit: int = 100) -> Tuple[List[Any], Optional[int]]:
+        """Returns up to limit items with a sequence number greater than after, plus the cursor for the next page.
+
+        The cursor is None when there are no more items.
+        """
+        rows = self.db.connection().execute(
+            "SELECT seq, value FROM history_items WHERE namespace = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (_namespace_key(namespace), after, limit),
+        ).fetchall()
+        next_cursor = rows[-1][0] if len(rows) == limit else None
+        return [json.loads(value) for _, value in rows], next_cursor
+
+    def since(self, namespace: Tuple[str, ...], after: int = 0) -> Tuple[List[Any], int]:
+        """Returns the items with a sequence number greater than after and the sequence number of the last one."""
+        rows = self.db.connection().execute(
+            "SELECT seq, value FROM history_items WHERE namespace = ? AND seq > ? ORDER BY seq",
+            (_namespace_key(namespace), after),
+        ).fetchall()
+        return [json.loads(value) for _, value in rows], rows[-1][0] if rows else after
+
+    def last_seq(self, namespace: Tuple[str, ...]) -> int:
+        """Returns the highest sequence number of the namespace, 0 when it is empty; an index-only lookup."""
+        return self.db.connection().execute(
+            "SELECT coalesce(max(seq), 0) FROM history_items WHERE namespace = ?", (_namespace_key(namespace),)
+        ).fetchone()[0]
+
+    def count(self, namespace: Tuple[str, ...]) -> int:
+        return self.db.connection().execute(
+            "SELECT count(*) FROM history_items WHERE namespace = ?", (_namespace_key(namespace),)
+        ).fetchone()[0]
+
+
+class _RecordingCursor:
+    """Collects the statements SqliteSaver writes so they can be replayed in the writer thread."""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, parameters=()):
+        self.statements.append((sql, [parameters]))
+
+    def executemany(self, sql, seq_of_parameters):
+        self.statements.append((sql, list(seq_of_parameters)))
+
+    def replay(self, conn: sqlite3.Connection) -> None:
+        for sql, parameters in self.statements:
+            conn.executemany(sql, parameters)
+
+
+class SQLiteSaver(SqliteSaver):
+    """langgraph's SqliteSaver on a SQLiteDatabase: reads use the calling thread's connection and writes
+    are committed in batches by the writer thread instead of one commit per write under a global lock.
+    """
+
+    def __init__(self, db: SQLiteDatabase, **kwargs):
+        self.db = db
+        super().__init__(None, **kwargs)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self.db.connection()
+
+    @conn.setter
+    def conn(self, value) -> None:
+        # SqliteSaver.__init__ assigns the connection; ours are opened per thread
+        pass
+
+    @classmethod
+    @contextmanager
+    def from_conn_string(cls, conn_string: str) -> Iterator["SQLiteSaver"]:
+        with SQLiteDatabase.from_uri(conn_string) as db:
+            yield cls(db)
+
+    def setup(self) -> None:
+        with self.lock:
+            super().setup()
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[Any]:
+        self.setup()
+        if not transaction:
+            cur = self.conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+            return
+
+        recording_cursor = _RecordingCursor()
+        yield recording_cursor
+        self.db.write(recording_cursor.replay)
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
@@ -0,0 +1,255 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from remote_agents import get_agent_function, load_agent_module
+
+AGENT_POOL_SIZE = int(os.environ.get("AGENT_POOL_SIZE", os.cpu_count() or 1))
+AGENT_CALL_TIMEOUT = float(os.environ.get("AGENT_CALL_TIMEOUT", "60"))
+AGENT_MAX_CALLS_PER_WORKER = int(os.environ.get("AGENT_MAX_CALLS_PER_WORKER", "500"))
+WORKER_START_TIMEOUT = 60
+# Backoff between attempts to start a worker in place of one that failed to start, doubled up to the maximum
+WORKER_RESTART_DELAY = 1.0
+WORKER_RESTART_MAX_DELAY = 30.0
+# A /query waits for the agent's LLM calls, so they are interactive
+AGENT_LLM_PRIORITY = os.environ.get("AGENT_LLM_PRIORITY", "interactive")
+# The scheduling proxy of common/llm_scheduler.py, e.g. http://localhost:11435; unset, agents call Ollama directly
+LLM_SCHEDULER_URL = os.environ.get("LLM_SCHEDULER_URL", "")
+
+
+def _route_llm_requests():
+    """Puts the agent's LLM calls in AGENT_LLM_PRIORITY, whatever Ollama client the agent uses.
+
+    The repo's chat models read the class from LLM_PRIORITY; other clients only honour OLLAMA_HOST (or a
+    base_url from OLLAMA_BASE_URL), so these point at the proxy with the class as path prefix.
+    """
+    os.environ["LLM_PRIORITY"] = AGENT_LLM_PRIORITY
+    if LLM_SCHEDULER_URL:
+        os.environ["OLLAMA_HOST"] = os.environ["OLLAMA_BASE_URL"] = (
+            f"{LLM_SCHEDULER_URL.rstrip('/')}/{AGENT_LLM_PRIORITY}")
+
+
+def _worker_main(conn, source, version):
+    """Worker loop: keeps the current agent module imported and runs one call per message."""
+    # Before the agent is imported, since clients read these when they are created
+    _route_llm_requests()
+    module = load_agent_module(source) if source is not None else None
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        call_version, call_source, function_name, state = message
+        try:
+            if call_version != version:
+                module = load_agent_module(call_source)
+                version = call_version
+            result = get_agent_function(module, function_name)(state)
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, context, source, version):
+        self.conn, child_conn = context.Pipe()
+        self.version = version
+        self.calls = 0
+        self.process = context.Process(target=_worker_main, args=(child_conn, source, version), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def stop(self, timeout=1.0):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class AgentProcessPool:
+    """Pool of pre-warmed worker processes that run remote agent functions outside the API process.
+
+    Each worker imports the agent once when it starts and talks to the pool over its own pipe. A call that
+    exceeds its timeout kills the worker and a fresh one is started in its place; workers are also recycled
+    after max_calls_per_worker calls. When the agent version changes, the new source is sent to each
+    worker with its next call.
+    """
+
+    def __init__(self, size=AGENT_POOL_SIZE, max_calls_per_worker=AGENT_MAX_CALLS_PER_WORKER,
+                 default_timeout=AGENT_CALL_TIMEOUT):
+        self.size = size
+        self.max_calls_per_worker = max_calls_per_worker
+        self.default_timeout = default_timeout
+
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._source = None
+        self._version = None
+        self._closed = False
+        self._starting = 0
+
+        self._waiting = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._acquisitions = 0
+        self._total_wait = 0.0
+
+    def start(self, source, version):
+        self._source, self._version = source, version
+        threads = [threading.Thread(target=self._start_worker) for _ in range(self.size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _start_worker(self):
+        """One attempt to start a worker; a failed one is retried in the background so the pool keeps its size."""
+        with self._lock:
+            self._starting += 1
+        if not self._spawn():
+            threading.Thread(target=self._keep_spawning, daemon=True).start()
+            return
+        with self._lock:
+            self._starting -= 1
+
+    def _keep_spawning(self):
+        """Starts a worker, retrying with backoff until one starts or the pool is closed."""
+        delay = WORKER_RESTART_DELAY
+        while not self._closed:
+            time.sleep(delay)
+            if self._closed or self._spawn():
+                break
+            delay = min(delay * 2, WORKER_RESTART_MAX_DELAY)
+        with self._lock:
+            self._starting -= 1
+
+    def _spawn(self):
+        """Starts a worker and hands it out only after it has imported the agent; returns whether it started."""
+        worker = _Worker(self._context, self._source, self._version)
+        try:
+            ready = worker.conn.poll(WORKER_START_TIMEOUT) and worker.conn.recv()[0] == "ready"
+        except (EOFError, OSError):
+            ready = False
+        if not ready:
+            print(f"Agent worker {worker.process.pid} failed to start")
+            worker.stop(timeout=0)
+            return False
+
+        with self._lock:
+            self._workers.add(worker)
+        self._idle.put(worker)
+        return True
+
+    def _replace(self, worker):
+        with self._lock:
+            self._workers.discard(worker)
+            self._recycled += 1
+        worker.stop(timeout=0)
+        if not self._closed:
+            # Start the replacement off the request path; it imports the agent before taking calls
+            threading.Thread(target=self._start_worker, daemon=True).start()
+
+    def call(self, version, source, function_name, state, timeout=None):
+        """Runs function_name(state) from the given agent version in a worker and returns its result."""
+        timeout = self.default_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        self._source, self._version = source, version
+
+        with self._lock:
+            self._waiting += 1
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise TimeoutError(f"No agent worker became available within {timeout}s")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        with self._lock:
+            self._acquisitions += 1
+            self._total_wait += time.monotonic() - (deadline - timeout)
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            worker.conn.send((version, source if worker.version != version else None, function_name, state))
+
+            finished = worker.conn.poll(max(deadline - time.monotonic(), 0))
+            if finished:
+                status, payload = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            with self._lock:
+                self._failed += 1
+            self._replace(worker)
+            raise RuntimeError(f"Agent worker died: {e}")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        if not finished:
+            with self._lock:
+                self._timeouts += 1
+            self._replace(worker)
+            raise TimeoutError(f"Agent call did not finish within {timeout}s")
+
+        # Only a successful call proves the worker loaded this version. After an error the load may have
+        # failed, so the next call sends the source again; the worker skips it if it has the version already
+        worker.version = version if status == "ok" else None
+        worker.calls += 1
+        if worker.calls >= self.max_calls_per_worker:
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+
+        with self._lock:
+            if status == "ok":
+                self._completed += 1
+            else:
+                self._failed += 1
+        if status != "ok":
+            raise RuntimeError(f"Agent call failed: {payload}")
+        return payload
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "workers": len(self._workers),
+                "starting": self._starting,
+                "idle_workers": self._idle.qsize(),
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "avg_wait_ms": round(self._total_wait / self._acquisitions * 1000, 3) if self._acquisitions else 0.0,
+            }
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
@@ -0,0 +1,71 @@
+import argparse
+import importlib.util
+import os
+import statistics
+import tempfile
+import time
+
+import remote_agents
+from remote_agents import load_agent_module
+
+
+def load_agent_module_from_temp_file(source: bytes, module_name: str = "remote_agent"):
+    """The previous loader: writes the source to a temp file and imports it from there."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".py") as temp_file:
+        temp_file.write(source)
+        temp_filename = temp_file.name
+
+    spec = importlib.util.spec_from_file_location(module_name, temp_filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    os.remove(temp_filename)
+
+    return module
+
+
+def generate_agent_source(functions: int) -> bytes:
+    lines = []
+    for i in range(functions):
+        lines.append(f"def helper_{i}(state):\n    value = state.get('user_input', '')\n"
+                     f"    return {{'step': {i}, 'length': len(value), 'upper': value.upper()}}\n")
+    lines.append("def custom_agent_function(state):\n    return helper_0(state)\n")
+    return "\n".join(lines).encode("utf-8")
+
+
+def measure(name, load, source, iterations, before_each=None):
+    timings = []
+    for _ in range(iterations):
+        if before_each:
+            before_each()
+        start = time.perf_counter()
+        load(source)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    print(f"{name:<24} mean {statistics.mean(timings):8.3f} ms   p50 {statistics.median(timings):8.3f} ms   "
+          f"max {max(timings):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark remote agent module loading")
+    parser.add_argument("--source", help="Python file to load; a synthetic agent is generated when omitted")
+    parser.add_argument("--functions", type=int, default=200, help="Size of the synthetic agent")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.source:
+        with open(args.source, "rb") as f:
+            source = f.read()
+    else:
+        source = generate_agent_source(args.functions)
+
+    print(f"Source size: {len(source)} bytes, {args.iterations} iterations\n")
+
+    measure("temp file (previous)", load_agent_module_from_temp_file, source, args.iterations)
+    measure("in-memory, cold cache", load_agent_module, source, args.iterations,
+            before_each=remote_agents._code_cache.clear)
+    load_agent_module(source)
+    measure("in-memory, warm cache", load_agent_module, source, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,120 @@
+import asyncio
+import json
 import os
-import requests
-import tempfile
-import importlib.util
-from fastapi import FastAPI, Query
-from langgraph.graph import StateGraph
-from typing import Dict, Optional
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+from agent_pool import AGENT_CALL_TIMEOUT, AgentProcessPool
+from remote_agents import RemoteAgentRegistry
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import deadline
+from common.lazy import aget, lazy
+
+REPO_URL = "https://github.com/andriiiZhukov/import-llm-agent"
+FILE_PATH = "main.py"
+FUNCTION_NAME = "custom_agent_function"
+# Budget of one graph run; a /query waiting longer gets a 504 and the run is cancelled
+QUERY_TIMEOUT = float(os.environ.get("QUERY_TIMEOUT", "90"))
 
 class WorkflowState(Dict):
     user_input: str
     result: Optional[str] = None
 
-def fetch_remote_agent(repo_url: str, file_path: str, function_name: str):
-    """Downloads a Python file from a remote GitHub repository and imports the specified function."""
-    raw_url = repo_url.replace("github.com", "raw.githubusercontent.com").rstrip("/") + "/master/" + file_path
-
-    print(f"raw_url = {raw_url}")
-
-    response = requests.get(raw_url)
-    
-    if response.status_code != 200:
-        raise ValueError(f"Failed to fetch agent code. Error code: {response.status_code}")
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".py") as temp_file:
-        temp_file.write(response.content)
-        temp_filename = temp_file.name
-    
-    spec = importlib.util.spec_from_file_location("remote_agent", temp_filename)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    os.remove(temp_filename)
-    
-    if not hasattr(module, function_name):
-        raise AttributeError(f"Function {function_name} not found in the loaded code.")
-    
-    return getattr(module, function_name)
-
-def llm_agent(state: WorkflowState):
-    repo_url = "https://github.com/andriiiZhukov/import-llm-agent"
-    file_path = "main.py"
-    function_name = "custom_agent_function"
-    
-    agent_function = fetch_remote_agent(repo_url, file_path, function_name)
-    state["result"] = agent_function(state)
+class BatchQuery(BaseModel):
+    queries: List[str]
+
+agent_registry = RemoteAgentRegistry()
+agent_pool = AgentProcessPool()
+
+async def llm_agent(state: WorkflowState):
+    source, version = agent_registry.get_source(REPO_URL, FILE_PATH)
+    # The pool kills the worker when the call outlives its timeout, which stops the agent's own LLM calls
+    timeout = deadline.remaining_timeout(AGENT_CALL_TIMEOUT)
+    state["result"] = await asyncio.to_thread(agent_pool.call, version, source, FUNCTION_NAME, dict(state), timeout)
     return state
 
-workflow = StateGraph(WorkflowState)
-workflow.add_node("llm_agent", llm_agent)
-workflow.set_entry_point("llm_agent")
-workflow.set_finish_point("llm_agent")
-graph = workflow.compile()
+@lazy
+def get_graph():
+    # langgraph is imported here, so a new worker starts serving without waiting for it
+    from langgraph.graph import StateGraph
+
+    workflow = StateGraph(WorkflowState)
+    workflow.add_node("llm_agent", llm_agent)
+    workflow.set_entry_point("llm_agent")
+    workflow.set_finish_point("llm_agent")
+    return workflow.compile()
+
+# Graph runs currently in progress, keyed by query, shared by identical concurrent requests
+in_flight_queries: Dict[str, asyncio.Task] = {}
+
+async def run_graph(graph, q: str):
+    async with deadline.limit(QUERY_TIMEOUT):
+        return await graph.ainvoke({"user_input": q})
 
-app = FastAPI()
+async def run_query(q: str):
+    task = in_flight_queries.get(q)
+    if task is None:
+        graph = await aget(get_graph)
+        task = in_flight_queries.get(q)
+    if task is None:
+        # The deadline belongs to the run, so requests joining it later share its remaining budget
+        task = asyncio.ensure_future(run_graph(graph, q))
+        in_flight_queries[q] = task
+        task.add_done_callback(lambda _: in_flight_queries.pop(q, None))
+    # A disconnecting client must not cancel the run for the other waiters
+    return await asyncio.shield(task)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-warm the worker processes with the current agent version
+    agent_pool.start(*agent_registry.get_source(REPO_URL, FILE_PATH))
+    # Builds the graph in the background; a request arriving earlier waits for it
+    warm_up = asyncio.create_task(aget(get_graph))
+    yield
+    await warm_up
+    agent_pool.close()
+    agent_registry.close()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/query")
-def process_query(q: str = Query(..., description="Enter query")):
+async def process_query(q: str = Query(..., description="Enter query")):
     """FastAPI endpoint to process requests via LangGraph"""
-    initial_state = {"user_input": q}
-    result = graph.invoke(initial_state)
-    
-    return result
+    try:
+        return await run_query(q)
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@app.post("/query/batch")
+async def process_query_batch(batch: BatchQuery):
+    """Runs many queries concurrently and streams one NDJSON line per query as soon as it finishes"""
+    semaphore = asyncio.Semaphore(agent_pool.size * 2)
+
+    async def run_one(q: str):
+        async with semaphore:
+            try:
+                return {"query": q, "result": await run_query(q)}
+            except Exception as e:
+                return {"query": q, "error": f"{type(e).__name__}: {e}"}
+
+    async def stream_results():
+        tasks = [asyncio.ensure_future(run_one(q)) for q in batch.queries]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.get("/metrics/agent-pool")
+def agent_pool_metrics():
+    """Queue depth and call counters of the agent worker pool"""
+    return agent_pool.metrics()
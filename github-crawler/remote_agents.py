@@ -0,0 +1,145 @@
+import hashlib
+import linecache
+import os
+import sys
+import threading
+import types
+from collections import OrderedDict
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.http_fetch import fetch
+
+REMOTE_AGENT_CACHE_TTL = 60
+REMOTE_AGENT_REFRESH_INTERVAL = float(os.environ.get("REMOTE_AGENT_REFRESH_INTERVAL", "300"))
+CODE_CACHE_SIZE = 32
+# Where raw files are downloaded from; the load test points it at a local stub
+GITHUB_RAW_BASE_URL = os.environ.get("GITHUB_RAW_BASE_URL", "https://raw.githubusercontent.com")
+
+_code_cache = OrderedDict()
+_code_cache_lock = threading.Lock()
+
+
+def get_raw_url(repo_url: str, file_path: str, branch: str = "master") -> str:
+    repo_path = repo_url.rstrip("/").split("github.com/", 1)[1]
+    return f"{GITHUB_RAW_BASE_URL.rstrip('/')}/{repo_path}/{branch}/{file_path}"
+
+
+def fetch_agent_source(repo_url: str, file_path: str, ttl: float = REMOTE_AGENT_CACHE_TTL):
+    """Downloads the agent source and returns it together with its version (ETag or content hash)."""
+    raw_url = get_raw_url(repo_url, file_path)
+
+    print(f"raw_url = {raw_url}")
+
+    response = fetch(raw_url, ttl=ttl)
+
+    if response.status_code != 200:
+        raise ValueError(f"Failed to fetch agent code. Error code: {response.status_code}")
+
+    version = response.headers.get("ETag") or hashlib.sha256(response.content).hexdigest()
+    return response.content, version
+
+
+def compile_agent_source(source: bytes):
+    """Compiles the source once per content hash and returns the cached code object."""
+    digest = hashlib.sha256(source).hexdigest()
+
+    with _code_cache_lock:
+        code = _code_cache.get(digest)
+        if code is not None:
+            _code_cache.move_to_end(digest)
+            return code
+
+    filename = f"<remote_agent {digest[:12]}>"
+    code = compile(source, filename, "exec")
+    # Lets tracebacks from the remote agent show its source lines
+    text = source.decode("utf-8")
+    linecache.cache[filename] = (len(text), None, text.splitlines(keepends=True), filename)
+
+    with _code_cache_lock:
+        _code_cache[digest] = code
+        while len(_code_cache) > CODE_CACHE_SIZE:
+            _, evicted = _code_cache.popitem(last=False)
+            linecache.cache.pop(evicted.co_filename, None)
+    return code
+
+
+def load_agent_module(source: bytes, module_name: str = "remote_agent"):
+    """Imports a module from the downloaded source code without writing it to disk.
+
+    Every call builds a fresh module namespace; only the compiled code object is shared.
+    """
+    code = compile_agent_source(source)
+    module = types.ModuleType(module_name)
+    module.__file__ = code.co_filename
+    exec(code, module.__dict__)
+
+    return module
+
+
+def get_agent_function(module, function_name: str):
+    if not hasattr(module, function_name):
+        raise AttributeError(f"Function {function_name} not found in the loaded code.")
+
+    return getattr(module, function_name)
+
+
+def fetch_remote_agent(repo_url: str, file_path: str, function_name: str):
+    """Downloads a Python file from a remote GitHub repository and imports the specified function."""
+    source, _ = fetch_agent_source(repo_url, file_path)
+    return get_agent_function(load_agent_module(source), function_name)
+
+
+class RemoteAgentRegistry:
+    """Current source and version of every agent file in use, for the worker pool that runs them.
+
+    The API process never imports the agents; the workers do, when a call brings a version they do not
+    have. A background thread revalidates the sources every refresh_interval seconds with conditional
+    requests, so the next call picks up a new version while calls already running keep the one they
+    started with.
+    """
+
+    def __init__(self, refresh_interval: float = REMOTE_AGENT_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._sources = {}
+        self._load_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refresh_thread = None
+
+    def get_source(self, repo_url: str, file_path: str):
+        """Returns the current (source, version) of an agent file without importing it."""
+        source = self._sources.get((repo_url, file_path))
+        if source is None:
+            with self._load_lock:
+                if (repo_url, file_path) not in self._sources:
+                    self._sources[(repo_url, file_path)] = fetch_agent_source(repo_url, file_path)
+                self._start_refresh_thread()
+                source = self._sources[(repo_url, file_path)]
+        return source
+
+    def refresh(self):
+        """Revalidates every registered source and records the new version of the ones that changed."""
+        for repo_url, file_path in list(self._sources):
+            try:
+                source, version = fetch_agent_source(repo_url, file_path, ttl=0)
+                if version == self._sources[(repo_url, file_path)][1]:
+                    continue
+                self._sources[(repo_url, file_path)] = (source, version)
+                print(f"Remote agent {repo_url}/{file_path} updated to version {version}")
+            except Exception as e:
+                print(f"Failed to refresh remote agent {repo_url}/{file_path}: {e}")
+
+    def _start_refresh_thread(self):
+        if self._refresh_thread is None and self.refresh_interval > 0:
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, name="remote-agent-refresh",
+                                                    daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while not self._stop_event.wait(self.refresh_interval):
+            self.refresh()
+
+    def close(self):
+        self._stop_event.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
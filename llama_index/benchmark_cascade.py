@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.model_cascade import LARGE_MODEL, MIN_CONFIDENCE, SMALL_MODEL, ModelCascade, with_confidence
+
+# Queries labeled with the source FirstWorkflow should route them to
+LABELED_QUERIES = [
+    ("Who is the president of Poland now?", "web-search"),
+    ("What is the weather in Warsaw today?", "web-search"),
+    ("Which team won the last Champions League final?", "web-search"),
+    ("What is the current price of bitcoin?", "web-search"),
+    ("What are the latest news about OpenAI?", "web-search"),
+    ("When is the next SpaceX launch?", "web-search"),
+    ("What is the exchange rate of the euro to the dollar today?", "web-search"),
+    ("Who won yesterday's Formula 1 race?", "web-search"),
+    ("Which movies are in cinemas this week?", "web-search"),
+    ("What is the latest version of Python released?", "web-search"),
+    ("How many people live in Tokyo according to the newest census?", "web-search"),
+    ("What did the central bank decide at its meeting this month?", "web-search"),
+    ("Explain what a linked list is.", "llm"),
+    ("Write a haiku about autumn.", "llm"),
+    ("What is the derivative of x squared?", "llm"),
+    ("Translate 'good morning' into French.", "llm"),
+    ("Summarize the plot of Romeo and Juliet.", "llm"),
+    ("What is the difference between TCP and UDP?", "llm"),
+    ("Give me three ideas for a birthday party.", "llm"),
+    ("How do I reverse a string in Python?", "llm"),
+    ("Hello!", "llm"),
+    ("What is the capital of France?", "llm"),
+    ("Explain recursion to a child.", "llm"),
+    ("What causes the seasons on Earth?", "llm"),
+]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+async def evaluate(name, cascade, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, correct, failed = [], 0, 0
+
+    async def route(query, expected):
+        nonlocal correct, failed
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await cascade.ainvoke({"query": query})
+            except ValueError:
+                failed += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            correct += result.source == expected
+
+    await asyncio.gather(*(route(query, expected) for query, expected in LABELED_QUERIES))
+    latencies.sort()
+    stats = cascade.stats()
+    escalated = sum(stats["escalations"].values())
+    print(f"{name:<22} accuracy {correct / len(LABELED_QUERIES):6.1%}, failed {failed:>2}, "
+          f"p50 {percentile(latencies, 0.5):6.2f}s, p95 {percentile(latencies, 0.95):6.2f}s, "
+          f"mean {statistics.mean(latencies) if latencies else 0:6.2f}s, escalated {escalated:>2}, "
+          f"answered by {stats['answered_by']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare routing quality and latency of the small model, the "
+                                                 "large model and the cascade on labeled queries")
+    parser.add_argument("--small", default=SMALL_MODEL)
+    parser.add_argument("--large", default=LARGE_MODEL)
+    parser.add_argument("--min-confidence", type=float, nargs="+", default=[MIN_CONFIDENCE])
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--stub-latency", type=float,
+                        help="Run against the stub Ollama server of benchmark_workflow.py with this latency, "
+                             "to check the harness without real models")
+    args = parser.parse_args()
+
+    if args.stub_latency is not None:
+        from benchmark_workflow import start_stub_ollama
+
+        server = start_stub_ollama(args.stub_latency)
+        os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+
+    from llama_index_test import QueryRoute, StructuredPrompt, query_router_prompt_template
+
+    def build(model):
+        return StructuredPrompt(model, query_router_prompt_template, with_confidence(QueryRoute))
+
+    configs = [(f"{args.small} only", (args.small,), 0.0), (f"{args.large} only", (args.large,), 0.0)]
+    configs += [(f"cascade conf>={threshold}", (args.small, args.large), threshold)
+                for threshold in args.min_confidence]
+    # The first call of a model includes loading it; only warm calls are compared
+    for model in (args.small, args.large):
+        asyncio.run(ModelCascade("warm_up", build, models=(model,)).ainvoke({"query": "Hello!"}))
+
+    print(f"{len(LABELED_QUERIES)} labeled queries, concurrency {args.concurrency}\n")
+    for name, models, threshold in configs:
+        cascade = ModelCascade("route_query", build, models=models, min_confidence=threshold)
+        asyncio.run(evaluate(name, cascade, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/chat like Ollama after a fixed delay.
+
+    Structured routing requests get {"source": "llm"}, batched ones one such route per numbered query.
+    """
+
+    latency = 0.2
+
+    def do_GET(self):
+        # /api/ps, polled by the model manager; the stub never reports a loaded model
+        self._send_json({"models": []})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        if self.path == "/api/show":
+            self._send_json({"modelfile": "", "model_info": {"llama.context_length": 8192}})
+            return
+
+        time.sleep(self.latency)
+        schema = body.get("format")
+        if isinstance(schema, dict) and "routes" in schema.get("properties", {}):
+            prompt = body["messages"][-1]["content"]
+            queries = re.findall(r"^\d+\. ", prompt, flags=re.MULTILINE)
+            content = json.dumps({"routes": [{"source": "llm"} for _ in queries]})
+        elif isinstance(schema, dict):
+            route = {"source": "llm"}
+            if "confidence" in schema.get("properties", {}):
+                route["confidence"] = 0.9
+            content = json.dumps(route)
+        else:
+            content = "Stub answer."
+
+        self._send_json({
+            "model": body.get("model"),
+            "created_at": "2024-01-01T00:00:00Z",
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "prompt_eval_count": 10,
+            "eval_count": 5,
+        })
+
+    def _send_json(self, data):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_ollama(latency):
+    StubOllamaHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllamaHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def benchmark(name, run_workflows, queries, concurrency):
+    start = time.perf_counter()
+    # The workflow steps print their routing decisions; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        await run_workflows(queries, concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<14} concurrency {concurrency:>3}: {len(queries)} queries in {elapsed:6.2f}s -> "
+          f"{len(queries) / elapsed:7.2f} queries/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure FirstWorkflow throughput against a stub Ollama server")
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated seconds per LLM call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    server = start_stub_ollama(args.latency)
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+
+    import llama_index_test
+    llama_index_test.workflow = llama_index_test.FirstWorkflow(verbose=False)
+
+    queries = [f"Question number {i}" for i in range(args.queries)]
+    print(f"Stub LLM latency {args.latency}s per call\n")
+    for concurrency in args.concurrency:
+        asyncio.run(benchmark("per-query", llama_index_test.run_workflows, queries, concurrency))
+        asyncio.run(benchmark("batch-routed", llama_index_test.run_workflows_batch_routed, queries, concurrency))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
 import asyncio
-from typing import Literal
+import os
+import sys
+from pathlib import Path
+from typing import List, Literal
 
-from llama_index.llms.ollama import Ollama
-from llama_index.tools.tavily_research import TavilyToolSpec
-from llama_index.utils.workflow import draw_all_possible_flows
 from llama_index.core.bridge.pydantic import BaseModel
 from llama_index.core.workflow import (
     Event,
@@ -15,7 +15,44 @@ from llama_index.core.workflow import (
 from llama_index.core import PromptTemplate
 from pydantic import Field
 
-llm = Ollama(model="llama3.1:8b", json_mode=True)
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import llm_scheduler, model_cascade, ollama_models
+from common.lazy import lazy
+from common.model_cascade import ModelCascade, with_confidence
+
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# Loads the models in the background while the workflow is being set up
+for model in ("llama3.1:8b", model_cascade.SMALL_MODEL):
+    ollama_models.get_model_manager().track(model)
+
+
+def ollama_llm(model):
+    # The Ollama integration takes most of the import time of this module, so it is imported on first use
+    from llama_index.llms.ollama import Ollama
+
+    return Ollama(model=model, json_mode=True, base_url=OLLAMA_BASE_URL, keep_alive=ollama_models.OLLAMA_KEEP_ALIVE)
+
+
+get_llm = lazy(lambda: ollama_llm("llama3.1:8b"))
+
+
+class StructuredPrompt:
+    """A prompt answered by a structured llama_index LLM, with the invoke/ainvoke interface of a ModelCascade step."""
+
+    def __init__(self, model, prompt_template, schema):
+        self.llm = ollama_llm(model).as_structured_llm(schema)
+        self.prompt_template = prompt_template
+
+    # The llama_index models do not go through ollama_models.chat_model, so their calls take a slot here
+    def invoke(self, inputs):
+        with llm_scheduler.slot():
+            return self.llm.complete(self.prompt_template.format(**inputs)).raw
+
+    async def ainvoke(self, inputs):
+        async with llm_scheduler.aslot():
+            result = await self.llm.acomplete(self.prompt_template.format(**inputs))
+        return result.raw
 
 
 class QueryRoute(BaseModel):
@@ -35,7 +72,33 @@ User query: {query}
 Source:     
 """
 query_router_prompt_template = PromptTemplate(query_router_prompt)
-query_router = llm.as_structured_llm(QueryRoute)
+# Routing only emits a label: phi answers first, llama3.1:8b when phi's answer is invalid or unsure
+query_router = ModelCascade(
+    "route_query", lambda model: StructuredPrompt(model, query_router_prompt_template, with_confidence(QueryRoute)))
+
+
+class QueryRoutes(BaseModel):
+    """Routes for a numbered list of user queries."""
+
+    routes: List[QueryRoute] = Field(
+        description="One route per user query, in the same order as the queries."
+    )
+
+
+batch_query_router_prompt = """
+You are an expert at routing user queries to web-search or llm. Think about each user query, what the user needs.
+For every query choose the correct source which will handle it.
+When the user needs external real-time knowledge, use web-search.
+In all other cases use llm.
+Return exactly one route per query, in the same order as the queries.
+User queries:
+{queries}
+Sources:
+"""
+batch_query_router_prompt_template = PromptTemplate(batch_query_router_prompt)
+get_batch_query_router = lazy(lambda: get_llm().as_structured_llm(QueryRoutes))
+
+ROUTING_BATCH_SIZE = 10
 
 
 llm_prompt = """
@@ -48,6 +111,12 @@ Answer:
 """
 llm_prompt_template = PromptTemplate(llm_prompt)
 
+@lazy
+def get_tavily_client():
+    from tavily import AsyncTavilyClient
+
+    return AsyncTavilyClient(api_key="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")
+
 
 class WebsearchEvent(Event):
     query: str
@@ -58,29 +127,59 @@ class LLMAnswerEvent(Event):
     context: str
 
 
+async def route_query_single(query: str) -> QueryRoute:
+    result = await query_router.ainvoke({"query": query})
+    print(f"Route result: {result.model_dump()}")
+    return result
+
+
+async def route_query_batch(queries: List[str]) -> List[QueryRoute]:
+    """Routes the queries with one LLM call, falling back to one call per query if the output doesn't validate."""
+    numbered_queries = "\n".join(f"{i}. {query}" for i, query in enumerate(queries, start=1))
+    try:
+        async with llm_scheduler.aslot():
+            result = await get_batch_query_router().acomplete(
+                batch_query_router_prompt_template.format(queries=numbered_queries))
+        routes = result.raw.routes
+        if len(routes) == len(queries):
+            return routes
+        print(f"Batch routing returned {len(routes)} routes for {len(queries)} queries, routing one by one")
+    except ValueError as e:
+        print(f"Batch routing output is not valid ({e}), routing one by one")
+
+    return await asyncio.gather(*(route_query_single(query) for query in queries))
+
+
+async def route_queries(queries: List[str]) -> List[QueryRoute]:
+    """Routes many queries in batches of ROUTING_BATCH_SIZE."""
+    batches = [queries[i:i + ROUTING_BATCH_SIZE] for i in range(0, len(queries), ROUTING_BATCH_SIZE)]
+    results = await asyncio.gather(*(route_query_batch(batch) for batch in batches))
+    return [route for routes in results for route in routes]
+
+
 class FirstWorkflow(Workflow):
     @step
     async def route_query(self, event: StartEvent) -> WebsearchEvent | LLMAnswerEvent | StopEvent:
         query = event.query
 
-        result = query_router.complete(query_router_prompt_template.format(query=query))
-        print(f"Route result: {result.model_dump()}")
-        source = result.model_dump()["raw"]["source"]
+        # The source is already known when the query was routed together with others
+        source = event.get("source")
+        if source is None:
+            result = await route_query_single(query)
+            source = result.source
         print(f"Chosen source: {source}")
         if source == "web-search":
             return WebsearchEvent(query=query)
         elif source == "llm":
             return LLMAnswerEvent(query=query, context="")
 
-        return StopEvent(result=result)
+        return StopEvent(result=source)
 
     @step
     async def websearch(self, event: WebsearchEvent) -> LLMAnswerEvent:
         query = event.query
-        tavily_search_tool = TavilyToolSpec(api_key="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")
-        result = tavily_search_tool.search(query=query, max_results=1)
-        doc = result[0]
-        txt = doc.text
+        result = await get_tavily_client().search(query=query, max_results=1, search_depth="advanced")
+        txt = result["results"][0]["content"]
         print(f"Found web context: {txt}")
 
         return LLMAnswerEvent(query=query, context=txt)
@@ -91,7 +190,8 @@ class FirstWorkflow(Workflow):
         context = event.context
 
         template = llm_prompt_template.format(query=query, context=context)
-        result = llm.complete(template)
+        async with llm_scheduler.aslot():
+            result = await get_llm().acomplete(template)
 
         return StopEvent(result=result)
 
@@ -99,11 +199,38 @@ class FirstWorkflow(Workflow):
 workflow = FirstWorkflow(verbose=True)
 
 
+#from llama_index.utils.workflow import draw_all_possible_flows
 #draw_all_possible_flows(FirstWorkflow, filename="basic_workflow.html")
 
 async def run_workflow():
-    result = await workflow.run(start_event=StartEvent(query="Who is the president of Poland now?"))
+    # A single user question: its calls go before batch work waiting for the LLM
+    with llm_scheduler.scheduling("interactive"):
+        result = await workflow.run(start_event=StartEvent(query="Who is the president of Poland now?"))
     print(result)
 
 
-asyncio.run(run_workflow())
+async def run_workflows(queries, concurrency=4):
+    """Runs the workflow for many queries at once, with at most `concurrency` runs in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(query):
+        async with semaphore:
+            return await workflow.run(start_event=StartEvent(query=query))
+
+    return await asyncio.gather(*(run_one(query) for query in queries))
+
+
+async def run_workflows_batch_routed(queries, concurrency=4):
+    """Like run_workflows, but routes all queries up front with batched LLM calls."""
+    routes = await route_queries(queries)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(query, route):
+        async with semaphore:
+            return await workflow.run(start_event=StartEvent(query=query, source=route.source))
+
+    return await asyncio.gather(*(run_one(query, route) for query, route in zip(queries, routes)))
+
+
+if __name__ == "__main__":
+    asyncio.run(run_workflow())
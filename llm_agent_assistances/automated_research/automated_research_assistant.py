@@ -1,20 +1,52 @@
-import requests
+import asyncio
+import contextvars
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
 from bs4 import BeautifulSoup
-from langchain_ollama import ChatOllama
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
-from PyPDF2 import PdfWriter
+from PyPDF2 import PdfReader, PdfWriter
 from langgraph.graph import Graph
 
-llm = ChatOllama(model="phi")
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common import deadline, llm_scheduler, ollama_models
+from common.http_fetch import DEFAULT_TIMEOUT, fetch
+
+MODEL = "phi"
+ollama_models.get_model_manager().track(MODEL)
 
 BREAK_LINES = "\n-------------------\n"
 
+MAX_FETCH_WORKERS = 5
+SOURCE_TIMEOUT = 20
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+CHUNK_SIZE = 3000
+CHUNK_OVERLAP = 200
+# Chunks summarized per source; the rest of a long document (e.g. a 10 MB PDF) is left out
+MAX_CHUNKS_PER_SOURCE = 20
+MAX_SUMMARY_WORKERS = 4
+SCHOLAR_CACHE_TTL = 24 * 3600
+SOURCE_CACHE_TTL = 7 * 24 * 3600
+# Budget of one research run, and the most a single LLM request may take of it
+RESEARCH_TIMEOUT = float(os.environ.get("RESEARCH_TIMEOUT", "900"))
+LLM_TIMEOUT = 300
+
+def ask(prompt):
+    """Returns the model's answer; the request is cancelled after LLM_TIMEOUT or once the run's budget is used up."""
+    # Reports are batch work: their calls give way to interactive requests for the shared LLM
+    llm = ollama_models.chat_model(MODEL, priority="batch")
+    # The model (and its async HTTP client) is made for this call, so it may live and die with this event loop
+    return asyncio.run(deadline.bounded(llm.ainvoke(prompt), LLM_TIMEOUT)).content
+
 def research_agent(query):
     print("\n 1. Fetching sources...\n")
 
     url = f"https://scholar.google.com/scholar?q={query.replace(' ', '+')}"
-    response = requests.get(url)
+    response = fetch(url, ttl=SCHOLAR_CACHE_TTL, timeout=deadline.remaining_timeout(DEFAULT_TIMEOUT))
     soup = BeautifulSoup(response.text, "html.parser")
 
     links = []
@@ -30,13 +62,93 @@ def research_agent(query):
 
     return {"sources": sources}
 
-def analyze_sources(inputs):
-    print("\n 2. Analyzing sources...\n")
+def extract_text(content, content_type, url):
+    """Extracts plain text from a downloaded HTML page or PDF document."""
+    if "application/pdf" in content_type or url.lower().endswith(".pdf"):
+        reader = PdfReader(io.BytesIO(content))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+    soup = BeautifulSoup(content, "html.parser")
+    for tag in soup(["script", "style", "nav", "header", "footer"]):
+        tag.decompose()
+    return soup.get_text(separator="\n", strip=True)
+
+def split_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Splits text into overlapping chunks of at most chunk_size characters."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        chunks.append(text[start:start + chunk_size])
+        start += chunk_size - overlap
+    return chunks
+
+def fetch_source(url):
+    """Downloads a single source, giving up after SOURCE_TIMEOUT seconds or at the run's deadline."""
+    timeout = deadline.remaining_timeout(SOURCE_TIMEOUT)
+    response = fetch(url, ttl=SOURCE_CACHE_TTL, timeout=timeout, max_bytes=MAX_SOURCE_BYTES)
+    response.raise_for_status()
+    return extract_text(response.content, response.headers.get("Content-Type", ""), url)
+
+def fetch_sources(inputs):
+    print("\n 2. Fetching full text of sources...\n")
+
+    urls = [source for source in inputs["sources"] if source.startswith("http")]
+    texts = {}
+
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        # Each worker runs in a copy of this context, so it sees the run's deadline
+        futures = {executor.submit(contextvars.copy_context().run, fetch_source, url): url for url in urls}
+        for done, future in enumerate(as_completed(futures), start=1):
+            url = futures[future]
+            try:
+                texts[url] = future.result()
+                print(f"[{done}/{len(urls)}] Fetched {url} ({len(texts[url])} chars)")
+            except Exception as e:
+                print(f"[{done}/{len(urls)}] Skipped {url}: {e}")
+
+    chunks = []
+    for url in urls:
+        if texts.get(url):
+            source_chunks = split_text(texts[url])[:MAX_CHUNKS_PER_SOURCE]
+            chunks.extend(f"Source: {url}\n{chunk}" for chunk in source_chunks)
+
+    print(f"Prepared {len(chunks)} chunks from {len(texts)} sources")
+    print(BREAK_LINES)
+
+    return {"sources": inputs["sources"], "chunks": chunks}
 
-    sources = "\n".join(inputs["sources"])
-    response = llm.invoke(f"Analyze sources:\n{sources}")
+def summarize_chunk(chunk):
+    return ask(f"Summarize the key findings of this source excerpt:\n{chunk}")
 
-    analysis = response.content
+def analyze_sources(inputs):
+    print("\n 3. Analyzing sources...\n")
+
+    chunks = inputs["chunks"]
+    if not chunks:
+        sources = "\n".join(inputs["sources"])
+        analysis = ask(f"Analyze sources:\n{sources}")
+
+        print("Analysis:")
+        print(analysis)
+        print(BREAK_LINES)
+
+        return {"analysis": analysis}
+
+    # Map: summarize every chunk in parallel, keeping the original chunk order
+    summaries = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=MAX_SUMMARY_WORKERS) as executor:
+        futures = {executor.submit(contextvars.copy_context().run, summarize_chunk, chunk): i
+                   for i, chunk in enumerate(chunks)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                summaries[futures[future]] = future.result()
+                print(f"Summarized chunk {done}/{len(chunks)}")
+            except Exception as e:
+                print(f"Skipped chunk {done}/{len(chunks)}: {e}")
+
+    # Reduce: combine the partial summaries in a single call
+    summaries_text = "\n\n".join(summary for summary in summaries if summary is not None)
+    analysis = ask(f"Analyze sources based on these summaries of their content:\n{summaries_text}")
 
     print("Analysis:")
     print(analysis)
@@ -45,11 +157,15 @@ def analyze_sources(inputs):
     return {"analysis": analysis}
 
 def fact_checker(inputs):
-    print("\n 3. Checking facts...\n")
+    print("\n 4. Checking facts...\n")
 
     analysis = inputs["analysis"]
-    response = llm.invoke(f"Check the accuracy of the information:\n{analysis}")
-    verified_data = response.content
+    # Fact checking is optional: close to the deadline the report is written from the analysis itself
+    if not deadline.allows():
+        print("Skipping the fact check, the run is close to its deadline")
+        return {"verified_data": analysis}
+
+    verified_data = ask(f"Check the accuracy of the information:\n{analysis}")
 
     print("\n Verified data:")
     print(verified_data)
@@ -58,11 +174,10 @@ def fact_checker(inputs):
     return {"verified_data": verified_data}
 
 def report_generator(inputs):
-    print("\n 4. Generating report...\n")
+    print("\n 5. Generating report...\n")
 
     verified_data = inputs["verified_data"]
-    response = llm.invoke(f"Create a scientific report on the materials:\n{verified_data}")
-    report = response.content
+    report = ask(f"Create a scientific report on the materials:\n{verified_data}")
 
     print("\n Report:")
     print(report)
@@ -70,10 +185,10 @@ def report_generator(inputs):
 
     return {"report": report}
 
-def generate_pdf(inputs):
-    print("\n 5. Generating PDF...\n")
+def generate_pdf(inputs, config):
+    print("\n 6. Generating PDF...\n")
 
-    pdf_filename = "report.pdf"
+    pdf_filename = config.get("configurable", {}).get("pdf_filename", "report.pdf")
     report_text = inputs["report"]
 
     c = canvas.Canvas(pdf_filename, pagesize=letter)
@@ -129,28 +244,34 @@ def generate_pdf(inputs):
     return {"pdf_report": f"{report_text} was written in the {pdf_filename}"}
 
 
-workflow = Graph()
+def build_research_assistant(checkpointer=None):
+    workflow = Graph()
 
-workflow.add_node("research", research_agent)
-workflow.add_node("analyze", analyze_sources)
-workflow.add_node("fact_check", fact_checker)
-workflow.add_node("report", report_generator)
-workflow.add_node("pdf", generate_pdf)
+    workflow.add_node("research", research_agent)
+    workflow.add_node("fetch", fetch_sources)
+    workflow.add_node("analyze", analyze_sources)
+    workflow.add_node("fact_check", fact_checker)
+    workflow.add_node("report", report_generator)
+    workflow.add_node("pdf", generate_pdf)
 
-workflow.add_edge("research", "analyze")
-workflow.add_edge("analyze", "fact_check")
-workflow.add_edge("fact_check", "report")
-workflow.add_edge("report", "pdf")
+    workflow.add_edge("research", "fetch")
+    workflow.add_edge("fetch", "analyze")
+    workflow.add_edge("analyze", "fact_check")
+    workflow.add_edge("fact_check", "report")
+    workflow.add_edge("report", "pdf")
 
-workflow.set_entry_point("research")
-workflow.set_finish_point("pdf")
+    workflow.set_entry_point("research")
+    workflow.set_finish_point("pdf")
 
-research_assistant = workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
-query = "Quantum computing"
-result = research_assistant.invoke(query)
 
-print("\n Final response:")
-print(result["pdf_report"])
+research_assistant = build_research_assistant()
 
+if __name__ == "__main__":
+    query = "Quantum computing"
+    with deadline.scope(deadline.Deadline(RESEARCH_TIMEOUT)), llm_scheduler.scheduling("batch", tenant=query):
+        result = research_assistant.invoke(query)
 
+    print("\n Final response:")
+    print(result["pdf_report"])
@@ -0,0 +1,115 @@
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from automated_research_assistant import RESEARCH_TIMEOUT, build_research_assistant
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common import deadline, llm_scheduler
+
+BREAK_LINES = "\n-------------------\n"
+
+
+def read_queries(path):
+    """Reads one query per line, skipping blank lines and # comments."""
+    with open(path, encoding="utf-8") as f:
+        queries = [line.strip() for line in f]
+    return [q for q in queries if q and not q.startswith("#")]
+
+
+def query_id(query):
+    """Stable identifier for a query, used as the checkpoint thread_id and report name."""
+    slug = re.sub(r"[^a-zA-Z0-9]+", "_", query).strip("_").lower()[:40]
+    digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:8]
+    return f"{slug}_{digest}"
+
+
+def run_query(graph, query, output_dir, timeout=RESEARCH_TIMEOUT):
+    """Runs one query, resuming from its last checkpoint if a previous run was interrupted or timed out."""
+    qid = query_id(query)
+    config = {"configurable": {
+        "thread_id": qid,
+        "pdf_filename": os.path.join(output_dir, f"{qid}.pdf"),
+    }}
+
+    state = graph.get_state(config)
+    if state.values and not state.next:
+        print(f"Skipping '{query}': already completed")
+        return "skipped", 0.0
+
+    start = time.perf_counter()
+    # The queries take turns for the batch share of the LLM, so one long report does not hold up the rest
+    with deadline.scope(deadline.Deadline(timeout)), llm_scheduler.scheduling("batch", tenant=qid):
+        if state.next:
+            print(f"Resuming '{query}' at {state.next}")
+            graph.invoke(None, config)
+        else:
+            print(f"Starting '{query}'")
+            graph.invoke(query, config)
+
+    return "completed", time.perf_counter() - start
+
+
+def print_summary(latencies, statuses, elapsed):
+    completed = statuses.count("completed")
+
+    print(BREAK_LINES)
+    print("Batch summary:")
+    print(f"  completed: {completed}, skipped: {statuses.count('skipped')}, failed: {statuses.count('failed')}")
+    print(f"  wall time: {elapsed:.1f}s, throughput: {completed / elapsed * 60 if elapsed else 0:.2f} queries/min")
+    if latencies:
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"  latency: mean {statistics.mean(latencies):.1f}s, p50 {statistics.median(latencies):.1f}s, "
+              f"p95 {p95:.1f}s, max {latencies[-1]:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the research assistant for many queries")
+    parser.add_argument("queries_file", help="File with one query per line")
+    parser.add_argument("--workers", type=int, default=4, help="Number of queries processed concurrently")
+    parser.add_argument("--output-dir", default="reports", help="Directory for the per-query PDF reports")
+    parser.add_argument("--timeout", type=float, default=RESEARCH_TIMEOUT, help="Deadline of one query, in seconds")
+    parser.add_argument("--checkpoints", default="research_checkpoints.sqlite",
+                        help="SQLite file with per-query progress, used to resume interrupted runs")
+    args = parser.parse_args()
+
+    queries = read_queries(args.queries_file)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    conn = sqlite3.connect(args.checkpoints, check_same_thread=False)
+    graph = build_research_assistant(checkpointer=SqliteSaver(conn))
+
+    latencies = []
+    statuses = []
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(run_query, graph, query, args.output_dir, args.timeout): query for query in queries}
+        for future in as_completed(futures):
+            query = futures[future]
+            try:
+                status, latency = future.result()
+            except Exception as e:
+                print(f"Query '{query}' failed: {e}")
+                status, latency = "failed", None
+            statuses.append(status)
+            if status == "completed":
+                latencies.append(latency)
+            print(f"[{len(statuses)}/{len(queries)}] {query}: {status}")
+
+    print_summary(latencies, statuses, time.perf_counter() - start)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,25 @@
-import requests
+import sys
+from pathlib import Path
+
 from bs4 import BeautifulSoup
-from langchain_ollama import ChatOllama
 from crewai import Agent, Task, Crew
 
-llm = ChatOllama(model="mistral")
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common import ollama_models
+from common.http_fetch import fetch
+
+# Digests are batch work: their calls give way to interactive requests for the shared LLM
+llm = ollama_models.chat_model("mistral", priority="batch")
 
 BREAK_LINES = "\n-------------------\n"
 
+NEWS_CACHE_TTL = 5 * 60
+
 def fetch_news():
     print("\n 1. Fetching news...\n")
 
     url = "https://news.ycombinator.com/"
-    response = requests.get(url)
+    response = fetch(url, ttl=NEWS_CACHE_TTL)
 
     soup = BeautifulSoup(response.text, "html.parser")
 
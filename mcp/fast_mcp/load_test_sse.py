@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import statistics
+import time
+from contextlib import AsyncExitStack
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+async def run_session(url, calls, store_ratio, connect_semaphore, connected, start, latencies, errors):
+    """Opens one SSE session, waits until every session is connected, then makes calls tool calls."""
+    # Whatever was opened is closed on the way out, also when connecting fails halfway
+    async with AsyncExitStack() as stack:
+        try:
+            async with connect_semaphore:
+                read, write = await stack.enter_async_context(sse_client(url=url, timeout=30, sse_read_timeout=300))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+        except Exception as e:
+            errors["connect"] = errors.get("connect", 0) + 1
+            if errors["connect"] == 1:
+                print(f"Connecting failed: {type(e).__name__}: {e}")
+            connected()
+            return
+
+        connected()
+        await start.wait()
+        for _ in range(calls):
+            if random.random() < store_ratio:
+                tool, arguments = "store_number", {"number": random.randint(1, 100)}
+            else:
+                tool, arguments = "generate_random_number", {"range_min": 1, "range_max": 100}
+
+            call_start = time.perf_counter()
+            try:
+                result = await session.call_tool(tool, arguments)
+                if result.isError:
+                    raise RuntimeError(result.content[0].text if result.content else "tool error")
+            except Exception as e:
+                errors[tool] = errors.get(tool, 0) + 1
+                if errors[tool] == 1:
+                    print(f"{tool} failed: {type(e).__name__}: {e}")
+                continue
+            latencies.setdefault(tool, []).append(time.perf_counter() - call_start)
+
+
+async def run_sessions(url, sessions, calls, store_ratio, connect_concurrency, barrier):
+    latencies, errors = {}, {}
+    connect_semaphore = asyncio.Semaphore(connect_concurrency)
+    all_connected, start = asyncio.Event(), asyncio.Event()
+    pending = sessions
+
+    def connected():
+        nonlocal pending
+        pending -= 1
+        if pending == 0:
+            all_connected.set()
+
+    tasks = [
+        asyncio.create_task(run_session(url, calls, store_ratio, connect_semaphore, connected, start, latencies, errors))
+        for _ in range(sessions)
+    ]
+    await all_connected.wait()
+    # Every process opens its sessions first, then all of them call tools at once
+    await asyncio.to_thread(barrier.wait)
+    start.set()
+    call_start = time.monotonic()
+    await asyncio.gather(*tasks)
+    return latencies, errors, call_start, time.monotonic()
+
+
+def _process_main(url, sessions, calls, store_ratio, connect_concurrency, barrier, results):
+    results.put(asyncio.run(run_sessions(url, sessions, calls, store_ratio, connect_concurrency, barrier)))
+
+
+def load_test(url, sessions, calls, store_ratio, connect_concurrency, processes):
+    """Spreads the sessions over several processes; a single Python client process is CPU-bound early."""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes + 1, timeout=300)
+    results = context.Queue()
+    workers = [
+        context.Process(target=_process_main, args=(url, sessions // processes + (i < sessions % processes), calls,
+                                                    store_ratio, connect_concurrency, barrier, results))
+        for i in range(processes)
+    ]
+    connect_start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    print(f"Opened SSE sessions in {time.perf_counter() - connect_start:.2f}s")
+
+    latencies, errors, starts, ends = {}, {}, [], []
+    for _ in workers:
+        process_latencies, process_errors, call_start, call_end = results.get()
+        for tool, values in process_latencies.items():
+            latencies.setdefault(tool, []).extend(values)
+        for key, count in process_errors.items():
+            errors[key] = errors.get(key, 0) + count
+        starts.append(call_start)
+        ends.append(call_end)
+    for worker in workers:
+        worker.join()
+
+    opened = sessions - errors.get("connect", 0)
+    elapsed = max(ends) - min(starts)
+    total_calls = sum(len(values) for values in latencies.values())
+    print(f"{opened}/{sessions} sessions made {total_calls} tool calls in {elapsed:.2f}s -> {total_calls / elapsed:.1f} calls/sec, "
+          f"errors {sum(errors.values())}")
+    report = {"sessions": opened, "elapsed_s": round(elapsed, 3),
+              "throughput_per_s": round(total_calls / elapsed, 1), "errors": errors, "tools": {}}
+    for tool, values in sorted(latencies.items()):
+        values.sort()
+        stats = {
+            "calls": len(values),
+            "mean_ms": round(statistics.mean(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+        report["tools"][tool] = stats
+        print(f"  {tool:<24} {stats['calls']:>6} calls, p50 {stats['p50_ms']:8.2f} ms, "
+              f"p95 {stats['p95_ms']:8.2f} ms, p99 {stats['p99_ms']:8.2f} ms, max {stats['max_ms']:8.2f} ms")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open many SSE sessions against mcp_sse_server.py and call tools")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/sse")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=20, help="Tool calls per session")
+    parser.add_argument("--store-ratio", type=float, default=0.5, help="Share of calls that are store_number")
+    parser.add_argument("--connect-concurrency", type=int, default=50, help="Sessions connecting at once, per process")
+    parser.add_argument("--processes", type=int, default=1, help="Client processes the sessions are spread over")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    report = load_test(args.url, args.sessions, args.calls, args.store_ratio, args.connect_concurrency,
+                       args.processes)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,36 @@
 import asyncio
+import json
 
 from langchain_mcp_adapters.tools import load_mcp_tools
-from mcp import ClientSession
-from mcp.client.sse import sse_client
-from mcp.types import CallToolResult
+from mcp.types import CallToolResult, ResourceUpdatedNotification
 
+from session_pool import MCPSessionPool
 
-async def run_mcp_client():
-    streams_context = sse_client(url="http://127.0.0.1:8080/sse")
-    streams = await streams_context.__aenter__()
+NUMBERS_URI = "resource://numbers"
+
+numbers_updated = asyncio.Event()
+
+
+async def handle_notification(notification):
+    if isinstance(notification, ResourceUpdatedNotification) and str(notification.params.uri) == NUMBERS_URI:
+        numbers_updated.set()
+
+
+async def read_numbers_from(session, cursor: int):
+    """Reads the numbers stored at positions >= cursor, page by page."""
+    numbers = []
+    while cursor is not None:
+        resource = await session.read_resource(f"{NUMBERS_URI}/page/{cursor}")
+        page = json.loads(resource.contents[0].text)
+        numbers.extend(page["numbers"])
+        cursor = page["next_cursor"]
+    return numbers
 
-    session_context = ClientSession(*streams)
-    session = await session_context.__aenter__()
-    await session.initialize()
+
+async def run_mcp_client():
+    # Sessions are initialized once and shared; tool and prompt lists are cached until the server changes them
+    session = await MCPSessionPool("http://127.0.0.1:8080/sse").start()
+    session.add_notification_handler(handle_notification)
 
     response = await session.list_tools()
     tools = response.tools
@@ -30,18 +48,33 @@ async def run_mcp_client():
     print(res)
 
     print("\nReading a resource from mcp server:")
-    resource = await session.read_resource("resource://numbers")
+    resource = await session.read_resource(NUMBERS_URI)
     print(resource)
 
+    print("\nSubscribing to the numbers and reading them page by page:")
+    await session.subscribe_resource(NUMBERS_URI)
+    numbers = await read_numbers_from(session, 0)
+    print(f"{len(numbers)} numbers stored")
+
+    await session.call_tool("store_number", {"number": 42})
+    # The server notifies subscribers after a change, so there is no need to poll; only new numbers are read
+    await asyncio.wait_for(numbers_updated.wait(), timeout=10)
+    numbers_updated.clear()
+    new_numbers = await read_numbers_from(session, len(numbers))
+    numbers.extend(new_numbers)
+    print(f"Numbers updated, read {len(new_numbers)} new: {new_numbers}")
+
     print("\nGetting a prompt from mcp server:")
     prompt = await session.get_prompt("my prompt")
     print(prompt)
 
-    #close session and streams
-    if session_context:
-        await session_context.__aexit__(None, None, None)
-    if streams_context:
-        await streams_context.__aexit__(None, None, None)
+    print("\nCalling generate_random_number 100 times concurrently over the pooled sessions:")
+    results = await asyncio.gather(*(
+        session.call_tool("generate_random_number", {"range_min": 1, "range_max": 100}) for _ in range(100)
+    ))
+    print([int(result.content[0].text) for result in results][:10], session.metrics())
+
+    await session.close()
 
 
 asyncio.run(run_mcp_client())
@@ -1,15 +1,19 @@
 import asyncio
+import sys
+from pathlib import Path
 from typing import TypedDict, Annotated
 
 from langchain_core.messages import HumanMessage
 from langchain_mcp_adapters.tools import load_mcp_tools
-from langchain_ollama import ChatOllama
 from langgraph.constants import START, END
 from langgraph.graph import StateGraph, add_messages
 from langgraph.prebuilt import ToolNode
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common import ollama_models
+
 
 
 server_params = StdioServerParameters(
@@ -17,7 +21,7 @@ server_params = StdioServerParameters(
     args=["path/to/mcp_stdio_server.py"],
 )
 
-llm = ChatOllama(model="llama3.1:8b", temperature=0)
+llm = ollama_models.chat_model("llama3.1:8b", temperature=0, priority="interactive")
 
 
 class GraphState(TypedDict):
@@ -33,9 +37,10 @@ async def run_mcp_client():
 
             llm_with_tools = llm.bind_tools(tools)
 
-            def call_agent(state: GraphState):
+            # Awaited, so the model call does not block the event loop the MCP session runs on
+            async def call_agent(state: GraphState):
                 messages = state['messages']
-                response = llm_with_tools.invoke(messages)
+                response = await llm_with_tools.ainvoke(messages)
                 return {"messages": [response]}
 
             def should_continue(state):
@@ -65,3 +70,4 @@ async def run_mcp_client():
 
 
 asyncio.run(run_mcp_client())
+ollama_models.get_model_manager().print_report()
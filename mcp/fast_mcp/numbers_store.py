@@ -0,0 +1,128 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from langgraph.store.postgres import PostgresStore
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.postgres_history import PostgresHistory
+from common.sqlite_backend import SQLiteDatabase, SQLiteHistory, SQLiteStore, is_sqlite_uri
+
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = 10
+NUMBERS_PAGE_SIZE = 100
+# Seconds between full recounts of the history that catch numbers committed out of order
+RECOUNT_INTERVAL = 60
+
+# (user_id, application)
+NAMESPACE = ("456", "mcp client")
+
+_numbers_store = None
+
+
+class NumbersStore:
+    """Numbers stored by the MCP servers, kept as an append-only history in Postgres or embedded SQLite.
+
+    With Postgres, the langgraph PostgresStore and the history share one connection pool. psycopg prepares
+    the statements on each pooled connection (prepare_threshold=0), so repeated get/put/append calls skip
+    parsing. With a sqlite:/// URI both use one SQLiteDatabase file and no server is needed.
+
+    Reads are served from an in-memory copy of the numbers. Other processes (the stdio and SSE servers) append
+    to the same history, so each read looks up the highest sequence number in the database (an index-only
+    lookup) and loads only the numbers appended since the previous read. Postgres sequence values can commit
+    out of order, so the copy is also recounted when new numbers arrive and every RECOUNT_INTERVAL seconds.
+    The history is append-only, so a position in the list is a stable pagination cursor.
+    """
+
+    def __init__(self, store, history):
+        self.store = store
+        self.history = history
+
+        self._cache_lock = threading.Lock()
+        self._numbers = []
+        self._last_seq = 0
+        self._recounted_at = 0.0
+
+    def setup(self):
+        self.store.setup()
+        self.history.setup()
+
+        # Numbers written before the history existed were kept as one list under "user_numbers"
+        if self.history.count(NAMESPACE) == 0:
+            existing_numbers = self.store.get(NAMESPACE, "user_numbers")
+            if existing_numbers:
+                self.history.extend(NAMESPACE, existing_numbers.value["numbers"])
+
+    def append(self, number: int) -> None:
+        self.history.append(NAMESPACE, number)
+
+    def all(self) -> List[int]:
+        return list(self._cached_numbers())
+
+    def page(self, cursor: int = 0, limit: int = NUMBERS_PAGE_SIZE) -> Tuple[List[int], Optional[int]]:
+        """Returns up to limit numbers starting at position cursor, plus the cursor of the next page.
+
+        The cursor is None when there are no more numbers.
+        """
+        numbers = self._cached_numbers()
+        page = numbers[cursor:cursor + limit]
+        next_cursor = cursor + limit if cursor + limit < len(numbers) else None
+        return page, next_cursor
+
+    def _cached_numbers(self) -> List[int]:
+        with self._cache_lock:
+            appended = self.history.last_seq(NAMESPACE) != self._last_seq
+            if appended:
+                # Only the numbers appended since the last read are loaded
+                numbers, self._last_seq = self.history.since(NAMESPACE, after=self._last_seq)
+                self._numbers.extend(numbers)
+            if appended or time.monotonic() - self._recounted_at >= RECOUNT_INTERVAL:
+                # A number with a lower sequence value that committed after a higher one was skipped;
+                # reload everything
+                if len(self._numbers) != self.history.count(NAMESPACE):
+                    self._numbers, self._last_seq = self.history.since(NAMESPACE)
+                self._recounted_at = time.monotonic()
+            return self._numbers
+
+
+@contextmanager
+def open_numbers_store(db_uri: str) -> Iterator[NumbersStore]:
+    """Opens the process-wide pool (or SQLite database) and runs the schema setup once; the store lives
+    until the block exits.
+
+    FastMCP enters its lifespan once per client session under SSE, so the pool is opened around mcp.run()
+    instead.
+    """
+    global _numbers_store
+
+    with _open_backend(db_uri) as (store, history):
+        numbers_store = NumbersStore(store, history)
+        numbers_store.setup()
+        _numbers_store = numbers_store
+        try:
+            yield numbers_store
+        finally:
+            _numbers_store = None
+
+
+@contextmanager
+def _open_backend(db_uri: str):
+    if is_sqlite_uri(db_uri):
+        with SQLiteDatabase.from_uri(db_uri) as db:
+            yield SQLiteStore(db), SQLiteHistory(db)
+        return
+
+    pool_kwargs = {"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row}
+    with ConnectionPool(db_uri, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, kwargs=pool_kwargs) as pool:
+        yield PostgresStore(conn=pool), PostgresHistory(pool)
+
+
+def get_numbers_store() -> NumbersStore:
+    if _numbers_store is None:
+        raise RuntimeError("The numbers store is not open, run the server inside open_numbers_store()")
+    return _numbers_store
@@ -0,0 +1,95 @@
+import asyncio
+import contextvars
+import threading
+
+from mcp.server.fastmcp import FastMCP
+
+# (uri, session) pairs subscribed in the session the current server.run() call serves
+_session_subscriptions = contextvars.ContextVar("session_subscriptions", default=None)
+
+
+class ResourceSubscriptions:
+    """resources/subscribe support for a FastMCP server.
+
+    FastMCP has no API for subscriptions, so install() registers the subscribe/unsubscribe handlers on the
+    underlying low-level server and advertises the capability. notify(uri) can be called from any thread
+    (sync tools run outside the event loop); every session subscribed to uri, or to a URI below it such as
+    a page of the resource, gets a notifications/resources/updated message. A session's subscriptions are
+    dropped when it closes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # uri -> {session: event loop of the session}
+
+    def install(self, mcp: FastMCP) -> None:
+        server = mcp._mcp_server
+
+        @server.subscribe_resource()
+        async def subscribe(uri):
+            session = server.request_context.session
+            with self._lock:
+                self._subscribers.setdefault(str(uri), {})[session] = asyncio.get_running_loop()
+            subscribed = _session_subscriptions.get()
+            if subscribed is not None:
+                subscribed.append((str(uri), session))
+
+        @server.unsubscribe_resource()
+        async def unsubscribe(uri):
+            session = server.request_context.session
+            with self._lock:
+                self._subscribers.get(str(uri), {}).pop(session, None)
+
+        run = server.run
+
+        async def run_and_drop_subscriptions(*args, **kwargs):
+            # run() serves one session and its request handlers inherit this context
+            subscribed = []
+            token = _session_subscriptions.set(subscribed)
+            try:
+                return await run(*args, **kwargs)
+            finally:
+                _session_subscriptions.reset(token)
+                for uri, session in subscribed:
+                    self._drop(uri, session)
+
+        server.run = run_and_drop_subscriptions
+
+        get_capabilities = server.get_capabilities
+
+        def get_capabilities_with_subscribe(*args, **kwargs):
+            capabilities = get_capabilities(*args, **kwargs)
+            if capabilities.resources is not None:
+                capabilities.resources.subscribe = True
+            return capabilities
+
+        server.get_capabilities = get_capabilities_with_subscribe
+
+    def notify(self, uri: str) -> None:
+        with self._lock:
+            targets = [
+                (subscribed_uri, session, loop)
+                for subscribed_uri, sessions in self._subscribers.items()
+                if subscribed_uri == uri or subscribed_uri.startswith(uri + "/")
+                for session, loop in sessions.items()
+            ]
+        for subscribed_uri, session, loop in targets:
+            if loop.is_closed():
+                self._drop(subscribed_uri, session)
+                continue
+            loop.call_soon_threadsafe(loop.create_task, self._send(subscribed_uri, session))
+
+    async def _send(self, uri, session) -> None:
+        try:
+            await session.send_resource_updated(uri)
+        except Exception:
+            # The client disconnected without unsubscribing
+            self._drop(uri, session)
+
+    def _drop(self, uri, session) -> None:
+        with self._lock:
+            self._subscribers.get(uri, {}).pop(session, None)
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(len(sessions) for sessions in self._subscribers.values())
@@ -0,0 +1,206 @@
+import asyncio
+import json
+
+import anyio
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.types import PromptListChangedNotification, ServerNotification, ToolListChangedNotification
+
+SESSION_POOL_SIZE = 4
+# Requests in flight on one session; MCP multiplexes them by request id over the same stream
+MAX_IN_FLIGHT_PER_SESSION = 32
+
+
+class _PooledSession:
+    """One initialized session, owned by its own task so the SSE stream is opened and closed in the same task."""
+
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+        self.session = None
+        self.in_flight = 0
+        self.subscriptions = {}  # str(uri) -> uri subscribed on this session
+        self.semaphore = asyncio.Semaphore(pool.max_in_flight_per_session)
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            async with sse_client(url=self.pool.url) as (read, write):
+                async with ClientSession(read, write, message_handler=self.pool._handle_message) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._closing.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def wait_ready(self):
+        await self._ready.wait()
+        if self.session is None:
+            raise ConnectionError(f"MCP session {self.index} is not connected: {self._error}")
+
+    def mark_dead(self):
+        self.session = None
+        self._closing.set()
+
+    @property
+    def alive(self):
+        return self.session is not None and not self._task.done()
+
+    async def close(self):
+        self._closing.set()
+        await self._task
+
+
+class MCPSessionPool:
+    """Warm, initialized MCP client sessions shared by many concurrent callers.
+
+    call_tool requests go to the least busy session; list_tools and get_prompt results are cached until the
+    server sends a list-changed notification. The pool has the list_tools/call_tool methods of ClientSession,
+    so load_mcp_tools(pool) builds langchain tools that run on the pool. A session that dropped is reopened
+    on its next use, with the resource subscriptions it had.
+    """
+
+    def __init__(self, url, size=SESSION_POOL_SIZE, max_in_flight_per_session=MAX_IN_FLIGHT_PER_SESSION):
+        self.url = url
+        self.size = size
+        self.max_in_flight_per_session = max_in_flight_per_session
+
+        self._sessions = []
+        self._tools = None
+        self._prompts = {}
+        # Bumped on every invalidation, so a result fetched while the list changed is not cached
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._reconnect_lock = asyncio.Lock()
+        self._notification_handlers = []
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    async def start(self):
+        self._sessions = [_PooledSession(self, i) for i in range(self.size)]
+        await asyncio.gather(*(pooled.wait_ready() for pooled in self._sessions))
+        return self
+
+    async def close(self):
+        await asyncio.gather(*(pooled.close() for pooled in self._sessions))
+        self._sessions = []
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def add_notification_handler(self, handler):
+        """Registers an async handler(notification) called for every server notification on any session."""
+        self._notification_handlers.append(handler)
+
+    async def _handle_message(self, message):
+        if not isinstance(message, ServerNotification):
+            return
+        notification = message.root
+        if isinstance(notification, (ToolListChangedNotification, PromptListChangedNotification)):
+            self.invalidate()
+        for handler in self._notification_handlers:
+            await handler(notification)
+
+    async def _acquire(self) -> _PooledSession:
+        if not all(pooled.alive for pooled in self._sessions):
+            async with self._reconnect_lock:
+                for i, pooled in enumerate(self._sessions):
+                    if not pooled.alive:
+                        # Reopen a session whose stream was closed, e.g. after a server restart
+                        replacement = _PooledSession(self, pooled.index)
+                        await replacement.wait_ready()
+                        # The server dropped the subscriptions together with the old session
+                        for key, uri in pooled.subscriptions.items():
+                            await replacement.session.subscribe_resource(uri)
+                            replacement.subscriptions[key] = uri
+                        self._sessions[i] = replacement
+        pooled = min(self._sessions, key=lambda pooled: pooled.in_flight)
+        pooled.in_flight += 1
+        return pooled
+
+    async def _request(self, method, *args, **kwargs):
+        _, result = await self._send(method, *args, **kwargs)
+        return result
+
+    async def _send(self, method, *args, **kwargs):
+        """Sends the request on the least busy session and returns that session with the result."""
+        for attempt in range(2):
+            pooled = await self._acquire()
+            try:
+                async with pooled.semaphore:
+                    session = pooled.session
+                    if session is None:
+                        # Another request marked the session dead while this one waited for it
+                        raise anyio.ClosedResourceError
+                    return pooled, await getattr(session, method)(*args, **kwargs)
+            except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+                # The stream was gone before the request was written, so it is safe to send it again
+                pooled.mark_dead()
+                if attempt:
+                    raise
+            finally:
+                pooled.in_flight -= 1
+
+    async def call_tool(self, name, arguments=None, **kwargs):
+        return await self._request("call_tool", name, arguments, **kwargs)
+
+    async def read_resource(self, uri):
+        return await self._request("read_resource", uri)
+
+    async def subscribe_resource(self, uri):
+        """Subscribes on one session; the notifications reach the handlers registered on the pool."""
+        pooled, result = await self._send("subscribe_resource", uri)
+        pooled.subscriptions[str(uri)] = uri
+        return result
+
+    async def list_tools(self, cursor=None):
+        if cursor is not None:
+            return await self._request("list_tools", cursor=cursor)
+        async with self._lock:
+            if self._tools is not None:
+                self.cache_hits += 1
+                return self._tools
+            self.cache_misses += 1
+            generation = self._generation
+            tools = await self._request("list_tools")
+            if generation == self._generation:
+                self._tools = tools
+            return tools
+
+    async def get_prompt(self, name, arguments=None):
+        key = (name, json.dumps(arguments, sort_keys=True))
+        async with self._lock:
+            if key in self._prompts:
+                self.cache_hits += 1
+                return self._prompts[key]
+            self.cache_misses += 1
+            generation = self._generation
+            prompt = await self._request("get_prompt", name, arguments)
+            if generation == self._generation:
+                self._prompts[key] = prompt
+            return prompt
+
+    def invalidate(self):
+        self._generation += 1
+        self._tools = None
+        self._prompts.clear()
+
+    def metrics(self):
+        return {
+            "sessions": len(self._sessions),
+            "connected": sum(pooled.alive for pooled in self._sessions),
+            "in_flight": [pooled.in_flight for pooled in self._sessions],
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
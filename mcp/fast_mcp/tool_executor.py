@@ -0,0 +1,74 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TOOL_THREADS = int(os.environ.get("MCP_TOOL_THREADS", "32"))
+
+
+class ToolExecutor:
+    """Runs blocking MCP tool and resource functions in a bounded thread pool.
+
+    FastMCP calls sync functions directly on the event loop, so one slow database call stalls every
+    connected session. offload() turns a sync function into an async one that FastMCP awaits while a pool
+    thread does the work; max_concurrency additionally limits how many calls of that function run at once
+    (e.g. to the size of the database pool), the rest wait without holding a thread.
+    """
+
+    def __init__(self, max_workers: int = TOOL_THREADS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-tool")
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def offload(self, max_concurrency: int = None):
+        def decorator(fn):
+            name = fn.__name__
+            semaphore = asyncio.Semaphore(max_concurrency or self.max_workers)
+            with self._lock:
+                self._metrics[name] = {"waiting": 0, "running": 0, "completed": 0, "failed": 0, "total_wait": 0.0}
+
+            # functools.wraps keeps the signature and docstring that FastMCP turns into the tool schema
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                metrics = self._metrics[name]
+                queued_at = time.monotonic()
+                self._update(metrics, waiting=1)
+                async with semaphore:
+                    self._update(metrics, waiting=-1, running=1, total_wait=time.monotonic() - queued_at)
+                    try:
+                        loop = asyncio.get_running_loop()
+                        result = await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+                    except Exception:
+                        self._update(metrics, running=-1, failed=1)
+                        raise
+                    self._update(metrics, running=-1, completed=1)
+                    return result
+
+            return wrapper
+
+        return decorator
+
+    def _update(self, metrics, **deltas) -> None:
+        with self._lock:
+            for key, delta in deltas.items():
+                metrics[key] += delta
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "waiting": m["waiting"],
+                    "running": m["running"],
+                    "completed": m["completed"],
+                    "failed": m["failed"],
+                    "avg_wait_ms": round(m["total_wait"] / (m["completed"] + m["failed"]) * 1000, 3)
+                    if m["completed"] + m["failed"] else 0.0,
+                }
+                for name, m in self._metrics.items()
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
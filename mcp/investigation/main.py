@@ -1,9 +1,15 @@
+import asyncio
 import json
+import sys
+from pathlib import Path
 from typing import Dict, List, Any, TypedDict, Optional
 from langgraph.graph import StateGraph
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common import deadline
+
 # Defining the state type
 class MCPState(TypedDict):
     messages: List[Any]  # Message history
@@ -71,7 +77,7 @@ def process_mcp_requests(requests: List[Dict[str, Any]]) -> Dict[str, Any]:
 
 # Graph components
 
-def analyze_query(state: MCPState) -> MCPState:
+async def analyze_query(state: MCPState) -> MCPState:
     """Analyzes the user's query and determines necessary MCP requests"""
     messages = state["messages"]
     llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0)
@@ -105,10 +111,11 @@ def analyze_query(state: MCPState) -> MCPState:
     """
     
     request_message = f"User query: {user_query}"
-    mcp_response = llm.invoke([
+    # The request is cancelled when the rest of the run's budget is used up
+    mcp_response = await deadline.bounded(llm.ainvoke([
         SystemMessage(content=system_prompt),
         HumanMessage(content=request_message)
-    ])
+    ]))
     
     try:
         mcp_request = json.loads(mcp_response.content)
@@ -127,7 +134,7 @@ def fetch_context(state: MCPState) -> MCPState:
     state["current_node"] = "generate_response"
     return state
 
-def generate_response(state: MCPState) -> MCPState:
+async def generate_response(state: MCPState) -> MCPState:
     """Generates a response based on the query and retrieved context"""
     messages = state["messages"]
     context_results = state.get("context_results", {})
@@ -149,10 +156,10 @@ def generate_response(state: MCPState) -> MCPState:
             system_prompt += f"\n--- Result {request_id} ---\n{result}\n"
     
     # Generating response
-    response = llm.invoke([
+    response = await deadline.bounded(llm.ainvoke([
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_query)
-    ])
+    ]))
     
     # Adding response to message history
     state["messages"].append(AIMessage(content=response.content))
@@ -188,8 +195,8 @@ def create_mcp_agent():
     return workflow.compile()
 
 # Example usage
-def chat_with_mcp_agent(query: str):
-    """Interacts with the MCP agent"""
+async def chat_with_mcp_agent(query: str, timeout: float = deadline.RUN_TIMEOUT):
+    """Interacts with the MCP agent; raises deadline.DeadlineExceeded when it takes longer than timeout"""
     graph = create_mcp_agent()
     
     # Initial state
@@ -200,13 +207,18 @@ def chat_with_mcp_agent(query: str):
         "current_node": "analyze_query"
     }
     
-    # Execute the graph
-    final_state = graph.invoke(initial_state)
+    # Execute the graph; its nodes read the deadline to budget their LLM calls
+    async with deadline.limit(timeout):
+        final_state = await graph.ainvoke(initial_state)
     
     # Return response
     return final_state["messages"][-1].content
 
 # Example queries
-print(chat_with_mcp_agent("Tell me about the latest Python versions"))
-print("\n--- New Query ---\n")
-print(chat_with_mcp_agent("What smartphones are in our database?"))
+async def main():
+    # One event loop for both queries: the OpenAI client keeps its async HTTP client between calls
+    print(await chat_with_mcp_agent("Tell me about the latest Python versions"))
+    print("\n--- New Query ---\n")
+    print(await chat_with_mcp_agent("What smartphones are in our database?"))
+
+asyncio.run(main())
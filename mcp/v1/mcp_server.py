@@ -1,34 +1,93 @@
-from fastapi import FastAPI
-from langgraph.graph import StateGraph, START, END
-from typing import TypedDict, Optional
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from typing import Optional
+# FastAPI validates the request and response with Pydantic, which needs this TypedDict before Python 3.12
+from typing_extensions import TypedDict
 import uvicorn
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.lazy import aget, lazy
+
+# Worker processes; each one imports this module and builds its own graph with build_graph()
+WORKERS = int(os.environ.get("MCP_WORKERS", "1"))
+# Requests one worker serves at once; above that it answers 429 right away instead of queueing them
+MAX_IN_FLIGHT = int(os.environ.get("MCP_MAX_IN_FLIGHT", "64"))
+
 class ToolState(TypedDict, total=False):
     input_text: Optional[str]
     response_text: Optional[str]
 
-app = FastAPI()
-
-graph = StateGraph(ToolState)
-
 def process_request(state: ToolState) -> dict:
     input_text = state.get("input_text", "No input provided")
     response_text = f"Processed: {input_text}"
     return {"response_text": response_text}
 
-graph.add_node("process_request", process_request)
+def build_graph():
+    from langgraph.graph import StateGraph, START, END
+
+    graph = StateGraph(ToolState)
+
+    graph.add_node("process_request", process_request)
+
+    graph.add_edge(START, "process_request")
+    graph.add_edge("process_request", END)
+
+    graph.set_entry_point("process_request")
+
+    return graph.compile()
+
+def create_app(graph_factory=build_graph, max_in_flight=MAX_IN_FLIGHT) -> FastAPI:
+    # Each worker builds its graph in the background after it starts accepting connections;
+    # a request arriving earlier waits for it
+    get_graph = lazy(graph_factory)
+    in_flight = 0
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        warm_up = asyncio.create_task(aget(get_graph))
+        yield
+        await warm_up
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.middleware("http")
+    async def limit_in_flight(request: Request, call_next):
+        nonlocal in_flight
+        # Metrics stay readable while the worker is saturated
+        if request.url.path == "/metrics":
+            return await call_next(request)
+        if in_flight >= max_in_flight:
+            return JSONResponse({"detail": "Too many requests in flight"}, status_code=429,
+                                headers={"Retry-After": "1"})
+        in_flight += 1
+        try:
+            return await call_next(request)
+        finally:
+            in_flight -= 1
 
-graph.add_edge(START, "process_request")
-graph.add_edge("process_request", END)
+    # ainvoke runs sync nodes in a thread, so a slow node does not hold up the other connections.
+    # The return type lets FastAPI serialize the response straight to JSON bytes with Pydantic
+    @app.post("/mcp")
+    async def mcp_handler(request: ToolState) -> ToolState:
+        compiled_graph = await aget(get_graph)
+        response = await compiled_graph.ainvoke(request)
+        return response
 
-graph.set_entry_point("process_request")
+    @app.get("/metrics")
+    async def metrics():
+        return {"pid": os.getpid(), "in_flight": in_flight, "max_in_flight": max_in_flight}
 
-compiled_graph = graph.compile()
+    return app
 
-@app.post("/mcp")
-async def mcp_handler(request: ToolState):
-    response = compiled_graph.invoke(request)
-    return response
+# Cheap to create, since the graph is built lazily; every worker process imports the module and gets its own
+app = create_app()
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run("mcp_server:app", host="0.0.0.0", port=8000, workers=WORKERS,
+                app_dir=os.path.dirname(os.path.abspath(__file__)), backlog=2048)
@@ -0,0 +1,210 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+import zstandard
+from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from psycopg import Connection
+from psycopg.rows import dict_row
+
+# Serialized values at least this large are compressed with zstd
+COMPRESS_THRESHOLD = 512
+# Serialized (and compressed) values at least this large are stored once in the content-addressed table
+BLOB_THRESHOLD = 2048
+BLOB_CACHE_SIZE = 256
+# Checkpoints listed one by one in the bytes report; older ones are only part of the totals
+BYTES_REPORT_CHECKPOINTS = 100
+
+SETUP_SQL = """
+CREATE TABLE IF NOT EXISTS checkpoint_content_blobs (
+    digest BYTEA PRIMARY KEY,
+    data BYTEA NOT NULL
+)
+"""
+
+
+class ContentAddressedSerializer(SerializerProtocol):
+    """Serializer that compresses large values and stores big ones once, referenced by their SHA-256.
+
+    Values are serialized with the wrapped serializer first. The type tag stored by the checkpointer records
+    what was applied ("zstd:" and/or "cas:" prefixes), so loads_typed can undo it and plain values written
+    by an ordinary PostgresSaver still load. A value that did not change between steps serializes to the
+    same bytes and therefore costs only a 32 byte reference on every later write.
+    """
+
+    def __init__(self, conn: Connection, serde: Optional[SerializerProtocol] = None,
+                 compress_threshold: int = COMPRESS_THRESHOLD, blob_threshold: int = BLOB_THRESHOLD):
+        self.conn = conn
+        self.serde = serde or JsonPlusSerializer()
+        self.compress_threshold = compress_threshold
+        self.blob_threshold = blob_threshold
+
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def setup(self) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute(SETUP_SQL)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        serialized_size = len(data)
+
+        if len(data) >= self.compress_threshold:
+            data = self._compressor.compress(data)
+            type_ = f"zstd:{type_}"
+
+        new_blob_bytes = 0
+        if len(data) >= self.blob_threshold:
+            digest = hashlib.sha256(data).digest()
+            new_blob_bytes = self._put_blob(digest, data)
+            data = digest
+            type_ = f"cas:{type_}"
+
+        stats = getattr(self._local, "stats", None)
+        if stats is not None:
+            stats["serialized_bytes"] += serialized_size
+            stats["stored_bytes"] += len(data) + new_blob_bytes
+            stats["new_blob_bytes"] += new_blob_bytes
+        return type_, data
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.startswith("cas:"):
+            type_, payload = type_[len("cas:"):], self._get_blob(payload)
+        if type_.startswith("zstd:"):
+            type_, payload = type_[len("zstd:"):], self._decompressor.decompress(payload)
+        return self.serde.loads_typed((type_, payload))
+
+    @contextmanager
+    def measure(self) -> Iterator[dict]:
+        """Counts the bytes of the values serialized by the current thread inside the block."""
+        stats = {"serialized_bytes": 0, "stored_bytes": 0, "new_blob_bytes": 0}
+        self._local.stats = stats
+        try:
+            yield stats
+        finally:
+            self._local.stats = None
+
+    def _put_blob(self, digest: bytes, data: bytes) -> int:
+        with self._lock:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                return 0
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO checkpoint_content_blobs (digest, data) VALUES (%s, %s) ON CONFLICT (digest) DO NOTHING",
+                (digest, data),
+            )
+            inserted = cur.rowcount
+        self._remember(digest, data)
+        return len(data) if inserted else 0
+
+    def _get_blob(self, digest: bytes) -> bytes:
+        digest = bytes(digest)
+        with self._lock:
+            data = self._cache.get(digest)
+            if data is not None:
+                self._cache.move_to_end(digest)
+                return data
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT data FROM checkpoint_content_blobs WHERE digest = %s", (digest,))
+            row = cur.fetchone()
+        if row is None:
+            raise KeyError(f"Checkpoint blob {digest.hex()} not found")
+        data = bytes(row["data"])
+        self._remember(digest, data)
+        return data
+
+    def _remember(self, digest: bytes, data: bytes) -> None:
+        with self._lock:
+            self._cache[digest] = data
+            while len(self._cache) > BLOB_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+
+class DeltaPostgresSaver(PostgresSaver):
+    """PostgresSaver that stores channel values through ContentAddressedSerializer and reports bytes per step.
+
+    PostgresSaver already writes a blob only for channels whose version changed since the parent checkpoint;
+    with this serializer, a changed version whose value is unchanged (or already stored by a pending write)
+    is a reference to the existing blob instead of a second copy.
+    """
+
+    def __init__(self, conn, blob_conn: Connection, pipe=None):
+        super().__init__(conn, pipe=pipe, serde=ContentAddressedSerializer(blob_conn))
+        # checkpoint_id -> bytes of the checkpoint and of the pending writes of the tasks that ran from it,
+        # for the last BYTES_REPORT_CHECKPOINTS checkpoints
+        self.bytes_written = OrderedDict()
+        self.bytes_total = {"checkpoints": 0, "serialized_bytes": 0, "stored_bytes": 0, "new_blob_bytes": 0}
+
+    @classmethod
+    @contextmanager
+    def from_conn_string(cls, conn_string: str, *, pipeline: bool = False) -> Iterator["DeltaPostgresSaver"]:
+        # The blob table gets its own connection, because values are serialized while the saver's
+        # connection is busy with the checkpoint statements
+        with Connection.connect(conn_string, autocommit=True, prepare_threshold=0, row_factory=dict_row) as conn, \
+                Connection.connect(conn_string, autocommit=True, prepare_threshold=0,
+                                   row_factory=dict_row) as blob_conn:
+            if pipeline:
+                with conn.pipeline() as pipe:
+                    yield cls(conn, blob_conn, pipe=pipe)
+            else:
+                yield cls(conn, blob_conn)
+
+    def setup(self) -> None:
+        super().setup()
+        self.serde.setup()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self.serde.measure() as stats:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+        self._record(checkpoint["id"], stats, step=metadata.get("step"), channels=sorted(new_versions))
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        # Checkpoints are saved in the background while the next tasks already run, so writes can
+        # arrive before the checkpoint they belong to
+        with self.serde.measure() as stats:
+            super().put_writes(config, writes, task_id, task_path)
+        self._record(config["configurable"]["checkpoint_id"], stats)
+
+    def _record(self, checkpoint_id, stats, **fields):
+        with self.lock:
+            if checkpoint_id not in self.bytes_written:
+                self.bytes_written[checkpoint_id] = {"step": None, "channels": [], **dict.fromkeys(stats, 0)}
+                self.bytes_total["checkpoints"] += 1
+                if len(self.bytes_written) > BYTES_REPORT_CHECKPOINTS:
+                    self.bytes_written.popitem(last=False)
+            entry = self.bytes_written[checkpoint_id]
+            entry.update(fields)
+            for key, value in stats.items():
+                entry[key] += value
+                self.bytes_total[key] += value
+
+    def print_bytes_report(self) -> None:
+        """Prints the bytes serialized and actually written per recent step (checkpoint plus the writes made
+        from it), and the totals since the saver was created."""
+        with self.lock:
+            entries = sorted((dict(entry) for entry in self.bytes_written.values()),
+                             key=lambda entry: entry["step"] or 0)
+            total = dict(self.bytes_total)
+        for entry in entries:
+            print(f"Step {entry['step']}: {entry['serialized_bytes']} bytes serialized, "
+                  f"{entry['stored_bytes']} bytes written ({entry['new_blob_bytes']} in new blobs), "
+                  f"changed channels {entry['channels']}")
+        print(f"Total of {total['checkpoints']} checkpoints: {total['serialized_bytes']} bytes serialized, "
+              f"{total['stored_bytes']} bytes written ({total['new_blob_bytes']} in new blobs)")
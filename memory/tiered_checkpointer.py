@@ -0,0 +1,284 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Iterator, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.constants import ERROR, INTERRUPT, TASKS
+from psycopg import Connection
+
+DURABILITY_MODES = ("async", "sync")
+# Threads kept in the in-memory tier; older ones are dropped once flushed and read back from the backend
+MAX_MEMORY_THREADS = 1000
+MAX_FLUSH_BATCH = 200
+FLUSH_RETRY_DELAY = 1.0
+
+
+class TieredCheckpointer(BaseCheckpointSaver):
+    """Write-back checkpointer: an in-memory tier in front of a slower saver such as PostgresSaver.
+
+    Reads and writes are served by a MemorySaver and a background thread flushes them to the backend in
+    order, one transaction per batch. With durability="async" a super-step only waits for the in-memory
+    write, except where the run stops: interrupt and error writes, and the checkpoint after which the graph
+    finishes or interrupts, wait until everything before them reached the backend. Recognizing those
+    checkpoints needs the graph, so compile it with compile(); for graphs it does not know, every checkpoint
+    waits. With durability="sync" every write waits until it reached the backend.
+    """
+
+    def __init__(self, backend: BaseCheckpointSaver, durability: str = "async",
+                 max_threads: int = MAX_MEMORY_THREADS, max_batch: int = MAX_FLUSH_BATCH):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}, got {durability!r}")
+        super().__init__(serde=backend.serde)
+        self.backend = backend
+        self.durability = durability
+        self.max_threads = max_threads
+        self.max_batch = max_batch
+
+        self.memory = MemorySaver()
+        self._threads = OrderedDict()  # thread_id -> number of writes not yet flushed, least recently used first
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._flushing = 0
+        self._error = None
+        self._closed = False
+        self._graphs = []
+
+        self.batches_flushed = 0
+        self.writes_flushed = 0
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="checkpoint-flusher", daemon=True)
+        self._flusher.start()
+
+    # Reads
+
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            resident = thread_id in self._threads
+            if resident:
+                self._threads.move_to_end(thread_id)
+
+        if resident:
+            checkpoint_tuple = self.memory.get_tuple(config)
+            if checkpoint_tuple is not None:
+                return checkpoint_tuple
+
+        # Older checkpoints, or a thread that is not (or no longer) in memory
+        checkpoint_tuple = self.backend.get_tuple(config)
+        if checkpoint_tuple is not None and not resident and not config["configurable"].get("checkpoint_id"):
+            self._load_into_memory(checkpoint_tuple)
+        return checkpoint_tuple
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        # The full history only exists in the backend
+        self.flush()
+        yield from self.backend.list(config, filter=filter, before=before, limit=limit)
+
+    def _load_into_memory(self, checkpoint_tuple: CheckpointTuple) -> None:
+        """Copies the latest checkpoint of a thread (with its pending writes) from the backend into memory."""
+        thread_id = checkpoint_tuple.config["configurable"]["thread_id"]
+        checkpoint = checkpoint_tuple.checkpoint
+        parent_config = checkpoint_tuple.parent_config or {
+            "configurable": {"thread_id": thread_id,
+                             "checkpoint_ns": checkpoint_tuple.config["configurable"].get("checkpoint_ns", "")}
+        }
+        with self._lock:
+            if thread_id in self._threads:
+                return
+            self._threads[thread_id] = 0
+        self.memory.put(parent_config, checkpoint, checkpoint_tuple.metadata, checkpoint["channel_versions"])
+
+        writes_by_task = {}
+        for task_id, channel, value in checkpoint_tuple.pending_writes or []:
+            writes_by_task.setdefault(task_id, []).append((channel, value))
+        for task_id, writes in writes_by_task.items():
+            self.memory.put_writes(checkpoint_tuple.config, writes, task_id)
+        self._evict()
+
+    # Writes
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = self.memory.put(config, checkpoint, metadata, new_versions)
+        self._enqueue(config["configurable"]["thread_id"], ("put", config, checkpoint, metadata, new_versions),
+                      self._stops_after(config, checkpoint, metadata))
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        self.memory.put_writes(config, writes, task_id, task_path)
+        self._enqueue(config["configurable"]["thread_id"], ("put_writes", config, writes, task_id, task_path),
+                      _stops_at(writes))
+
+    def get_next_version(self, current, channel):
+        return self.backend.get_next_version(current, channel)
+
+    def _enqueue(self, thread_id, operation, boundary=False) -> None:
+        with self._changed:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+            self._threads.move_to_end(thread_id)
+            self._queue.append((thread_id, operation))
+            self._changed.notify_all()
+        if self.durability == "sync" or boundary:
+            self.flush()
+
+    # Boundaries of a run
+
+    def compile(self, workflow, **kwargs):
+        """Compiles workflow with this checkpointer, which then flushes only where the graph stops."""
+        graph = workflow.compile(checkpointer=self, **kwargs)
+        self._graphs.append(graph)
+        return graph
+
+    def _stops_after(self, config, checkpoint, metadata) -> bool:
+        """Whether the run finishes or interrupts after this checkpoint, as far as the compiled graphs tell."""
+        if config["configurable"].get("checkpoint_ns"):
+            return False  # a subgraph's steps; the parent's checkpoints and interrupt writes mark where it stops
+        if not self._graphs:
+            return True
+        return any(_graph_stops_after(graph, checkpoint, metadata) for graph in self._graphs)
+
+    # Flushing
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Blocks until every write made so far has reached the backend.
+
+        Raises the backend error if the last flush attempt failed, and TimeoutError if timeout passes first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while self._queue or self._flushing:
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    raise error
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"{len(self._queue)} checkpoint writes not flushed within {timeout}s")
+                self._changed.wait(remaining)
+        self._evict()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._changed:
+                while not self._queue and not self._closed:
+                    self._changed.wait()
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch))]
+                self._flushing = len(batch)
+
+            try:
+                self._write_batch([operation for _, operation in batch])
+            except Exception as e:
+                print(f"Checkpoint flush failed, retrying in {FLUSH_RETRY_DELAY}s: {type(e).__name__}: {e}")
+                with self._changed:
+                    self._queue.extendleft(reversed(batch))
+                    self._flushing = 0
+                    self._error = e
+                    self._changed.notify_all()
+                time.sleep(FLUSH_RETRY_DELAY)
+                continue
+
+            with self._changed:
+                for thread_id, _ in batch:
+                    self._threads[thread_id] = self._threads.get(thread_id, 1) - 1
+                self._flushing = 0
+                self._error = None
+                self.batches_flushed += 1
+                self.writes_flushed += len(batch)
+                self._changed.notify_all()
+
+    def _write_batch(self, operations) -> None:
+        conn = getattr(self.backend, "conn", None)
+        if isinstance(conn, Connection):
+            # One commit for the whole batch instead of one per statement
+            with conn.transaction():
+                self._apply(operations)
+        else:
+            self._apply(operations)
+
+    def _apply(self, operations) -> None:
+        for kind, *args in operations:
+            if kind == "put":
+                self.backend.put(*args)
+            else:
+                self.backend.put_writes(*args)
+
+    def _evict(self) -> None:
+        """Drops the least recently used threads without unflushed writes once there are more than max_threads."""
+        with self._lock:
+            excess = len(self._threads) - self.max_threads
+            evicted = []
+            for thread_id, unflushed in list(self._threads.items()):
+                if excess <= 0:
+                    break
+                if unflushed == 0:
+                    del self._threads[thread_id]
+                    evicted.append(thread_id)
+                    excess -= 1
+        for thread_id in evicted:
+            self.memory.delete_thread(thread_id)
+
+    def close(self) -> None:
+        """Flushes the remaining writes and stops the background thread."""
+        self.flush()
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        self._flusher.join()
+
+    def __enter__(self) -> "TieredCheckpointer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # The in-memory tier does not block the event loop; backend reads and flushes run in a thread
+
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        if self.durability == "sync" or self._stops_after(config, checkpoint, metadata):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        if self.durability == "sync" or _stops_at(writes):
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+        return self.put_writes(config, writes, task_id, task_path)
+
+
+def _stops_at(writes) -> bool:
+    """Interrupt and error writes end the run without a checkpoint after them."""
+    return any(channel in (INTERRUPT, ERROR) for channel, _ in writes)
+
+
+def _graph_stops_after(graph, checkpoint, metadata) -> bool:
+    """Whether graph has no task left after checkpoint, or interrupts before or after the step around it."""
+    values, versions, seen = checkpoint["channel_values"], checkpoint["channel_versions"], checkpoint["versions_seen"]
+
+    def triggered(name, channel):
+        if channel not in values:
+            return False
+        seen_version = seen.get(name, {}).get(channel)
+        return seen_version is None or versions[channel] > seen_version
+
+    next_nodes = [name for name, node in graph.nodes.items()
+                  if any(triggered(name, channel) for channel in node.triggers)]
+    if not next_nodes and not values.get(TASKS) and not checkpoint.get("pending_sends"):
+        return True
+    before, after = graph.interrupt_before_nodes, graph.interrupt_after_nodes
+    if before == "*" or any(name in before for name in next_nodes):
+        return True
+    ran = (metadata.get("writes") or {}) if metadata.get("source") == "loop" else {}
+    return bool(ran) and (after == "*" or any(name in after for name in ran))
@@ -1,3 +1,5 @@
+import sys
+from pathlib import Path
 from pprint import pprint
 from typing import TypedDict, Literal
 import asyncio
@@ -5,23 +7,50 @@ import asyncio
 from langchain_core.documents import Document
 from langchain_core.messages import AIMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_ollama import OllamaEmbeddings, ChatOllama
-from langchain_qdrant import QdrantVectorStore
 from pydantic import BaseModel, Field
-from qdrant_client.models import Filter, FieldCondition, MatchValue
-from langgraph.graph import END, StateGraph, START
-from langchain_community.tools import TavilySearchResults
-from langgraph.checkpoint.memory import MemorySaver
 
-embeddings = OllamaEmbeddings(model="llama3.1:8b")
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import deadline, llm_scheduler, model_cascade, ollama_models
+from common.lazy import lazy
+from common.model_cascade import ModelCascade, with_confidence
 
-vector_store = QdrantVectorStore.from_existing_collection(
-    embedding=embeddings,
-    collection_name="collection_name",
-    path="path_to_vectorstore"
-)
+# The clients, the vector store and the chains below are built when a graph step first needs them, and the
+# frameworks behind them are imported only then
 
-llm = ChatOllama(model="llama3.1:8b", temperature=0)
+
+@lazy
+def track_models():
+    """Starts loading the graph's models in the background; called by the first step that builds one."""
+    for model in ("llama3.1:8b", model_cascade.SMALL_MODEL):
+        ollama_models.get_model_manager().track(model)
+
+
+@lazy
+def get_vector_store():
+    from langchain_qdrant import QdrantVectorStore
+
+    return QdrantVectorStore.from_existing_collection(
+        embedding=ollama_models.embeddings("llama3.1:8b"),
+        collection_name="collection_name",
+        path="path_to_vectorstore"
+    )
+
+
+@lazy
+def get_llm():
+    track_models()
+    return ollama_models.chat_model("llama3.1:8b", temperature=0)
+
+
+def structured_step(prompt_template, schema):
+    """build() of a cascade step: the prompt piped into a model that answers in schema plus a confidence."""
+    def build(model):
+        track_models()
+        # Ollama's JSON schema output works without tool calling, which phi does not support
+        return prompt_template | ollama_models.chat_model(model, temperature=0).with_structured_output(
+            with_confidence(schema), method="json_schema")
+
+    return build
 
 
 class GraphState(TypedDict):
@@ -50,12 +79,15 @@ Query: {query}
 Source:     
 """
 query_router_prompt_template = ChatPromptTemplate.from_template(query_router_prompt)
-query_router = query_router_prompt_template | llm.with_structured_output(QueryRoute)
+# Routing and grading only emit a label or a number: phi answers first, llama3.1:8b when phi is unsure
+query_router = ModelCascade("route_query", structured_step(query_router_prompt_template, QueryRoute))
 
 
-def run_query_router(state: GraphState):
+# The nodes await every model, vector store and search call through deadline.bounded: the call gets what is
+# left of the run's budget and is cancelled, with its HTTP request, once the run's deadline passes
+async def run_query_router(state: GraphState):
     query = state["query"]
-    query_route = query_router.invoke({"query": query})
+    query_route = await deadline.bounded(query_router.ainvoke({"query": query}))
     return {"query_route_name": query_route.source}
 
 
@@ -88,13 +120,18 @@ Documents: {docs}
 Relevant document number: 
 """
 retrieved_docs_evaluator_prompt_template = ChatPromptTemplate.from_template(evaluate_retrieved_docs_prompt)
-retrieved_docs_evaluator = retrieved_docs_evaluator_prompt_template | llm.with_structured_output(DocumentAnswer)
+retrieved_docs_evaluator = ModelCascade(
+    "grade_documents", structured_step(retrieved_docs_evaluator_prompt_template, DocumentAnswer),
+    validate=lambda result: 0 <= result.relevant_document_number <= 10)
 
 
-def search_and_evaluate_docs(state: GraphState):
+async def search_and_evaluate_docs(state: GraphState):
+    from qdrant_client.models import Filter, FieldCondition, MatchValue
+
     query = state["query"]
     docs_filter = Filter(must=[FieldCondition(key="metadata.category", match=MatchValue(value="NarrativeText"))])
-    retrieved_docs = vector_store.similarity_search(query, k=10, filter=docs_filter)
+    retrieved_docs = await deadline.bounded(
+        get_vector_store().asimilarity_search(query, k=10, filter=docs_filter))
     i = 1
     docs_txt = []
     for d in retrieved_docs:
@@ -103,9 +140,9 @@ def search_and_evaluate_docs(state: GraphState):
         docs_txt.append(txt)
     documents_txt = "\n".join(docs_txt)
 
-    result = retrieved_docs_evaluator.invoke({"query": query, "docs": documents_txt})
+    result = await deadline.bounded(retrieved_docs_evaluator.ainvoke({"query": query, "docs": documents_txt}))
     relevant_document_number = result.model_dump()["relevant_document_number"]
-    if relevant_document_number > 0:
+    if 0 < relevant_document_number <= len(retrieved_docs):
         print("Relevant doc is found")
         relevant_doc = retrieved_docs[relevant_document_number - 1]
         return {"documents": [relevant_doc]}
@@ -114,13 +151,17 @@ def search_and_evaluate_docs(state: GraphState):
         return {"documents": []}
 
 
-web_search_tool = TavilySearchResults()
+@lazy
+def get_web_search_tool():
+    from langchain_community.tools import TavilySearchResults
+
+    return TavilySearchResults()
 
 
-def web_search(state: GraphState):
+async def web_search(state: GraphState):
     query = state["query"]
 
-    docs = web_search_tool.invoke({"query": query})
+    docs = await deadline.bounded(get_web_search_tool().ainvoke({"query": query}))
     web_results = "\n".join([d["content"] for d in docs])
     web_results = Document(page_content=web_results)
 
@@ -136,23 +177,23 @@ Context: {context}
 Answer:
 """
 rag_template = ChatPromptTemplate.from_template(rag_prompt)
-rag_agent = rag_template | llm
+get_rag_agent = lazy(lambda: rag_template | get_llm())
 
 
-def generate_answer(state: GraphState):
+async def generate_answer(state: GraphState):
     query = state["query"]
     docs = state["documents"]
     context = ""
     if docs:
         context = docs[0].page_content
 
-    result = rag_agent.invoke({"query": query, "context": context})
+    result = await deadline.bounded(get_rag_agent().ainvoke({"query": query, "context": context}))
     return {"final_answer": result}
 
 
-def llm_answer(state: GraphState):
+async def llm_answer(state: GraphState):
     query = state["query"]
-    result = llm.invoke(query)
+    result = await deadline.bounded(get_llm().ainvoke(query))
     return {"final_answer": result}
 
 
@@ -172,15 +213,21 @@ Answer: {answer}
 Score:
 """
 answer_grade_template = ChatPromptTemplate.from_template(answer_grade_prompt)
-structured_llm_grader = llm.with_structured_output(GradeAnswer)
-answer_grader_agent = answer_grade_template | structured_llm_grader
+answer_grader_agent = ModelCascade(
+    "grade_answer", structured_step(answer_grade_template, GradeAnswer),
+    validate=lambda result: result.binary_score in ("yes", "no"))
 
 
-def grade_answer(state: GraphState):
+async def grade_answer(state: GraphState):
+    # Grading is optional: with the budget nearly spent the answer is returned as it is
+    if not deadline.allows():
+        print("Skipping answer grading, the run is close to its deadline")
+        return {"answer_score": "skipped"}
+
     query = state["query"]
     answer = state["final_answer"].content
 
-    result = answer_grader_agent.invoke({"query": query, "answer": answer})
+    result = await deadline.bounded(answer_grader_agent.ainvoke({"query": query, "answer": answer}))
     score = result.model_dump()["binary_score"]
 
     return {"answer_score": score}
@@ -195,6 +242,10 @@ def check_answer_grade(state: GraphState):
 
     score = state["answer_score"]
     if score == 'no':
+        # A rewrite runs the whole graph once more, so it needs a full optional step budget left
+        if not deadline.allows():
+            print("Not rewriting the query, the run is close to its deadline")
+            return "end"
         return "rewrite_query"
     else:
         return "answer is ok"
@@ -214,59 +265,70 @@ Query: {query}
 Improved query:     
 """
 query_rewrite_prompt = ChatPromptTemplate.from_template(query_rewrite_template)
-query_rewriter = query_rewrite_prompt | llm.with_structured_output(UpdatedQuery)
+get_query_rewriter = lazy(lambda: query_rewrite_prompt | get_llm().with_structured_output(UpdatedQuery))
 
 
-def rewrite_query(state: GraphState):
+async def rewrite_query(state: GraphState):
     query = state["query"]
-    result = query_rewriter.invoke({"query": query})
+    result = await deadline.bounded(get_query_rewriter().ainvoke({"query": query}))
     new_query = result.model_dump()["query"]
     print(f"Updated query: {new_query}")
     return {"query": new_query, "rewrite_query_counter": 1}
 
 
-workflow = StateGraph(GraphState)
+@lazy
+def get_app():
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.graph import END, StateGraph, START
 
-workflow.add_node("route_query", run_query_router)
-workflow.add_node("vectorstore", search_and_evaluate_docs)
-workflow.add_node("web_search", web_search)
-workflow.add_node("llm_answer", llm_answer)
-workflow.add_node("generate_answer", generate_answer)
-workflow.add_node("grade_answer", grade_answer)
-workflow.add_node("rewrite_query", rewrite_query)
+    workflow = StateGraph(GraphState)
 
-workflow.add_edge(START, "route_query")
-workflow.add_conditional_edges("route_query", check_query_route,
-                               {"vectorstore": "vectorstore", "web_search": "web_search",
-                                "llm_answer": "llm_answer"})
+    workflow.add_node("route_query", run_query_router)
+    workflow.add_node("vectorstore", search_and_evaluate_docs)
+    workflow.add_node("web_search", web_search)
+    workflow.add_node("llm_answer", llm_answer)
+    workflow.add_node("generate_answer", generate_answer)
+    workflow.add_node("grade_answer", grade_answer)
+    workflow.add_node("rewrite_query", rewrite_query)
 
-workflow.add_edge("vectorstore", "generate_answer")
-workflow.add_edge("web_search", "generate_answer")
-workflow.add_edge("llm_answer", END)
+    workflow.add_edge(START, "route_query")
+    workflow.add_conditional_edges("route_query", check_query_route,
+                                   {"vectorstore": "vectorstore", "web_search": "web_search",
+                                    "llm_answer": "llm_answer"})
 
-workflow.add_edge("generate_answer", "grade_answer")
+    workflow.add_edge("vectorstore", "generate_answer")
+    workflow.add_edge("web_search", "generate_answer")
+    workflow.add_edge("llm_answer", END)
 
-workflow.add_conditional_edges("grade_answer", check_answer_grade,
-                               {"rewrite_query": "rewrite_query", "answer is ok": END, "end": END})
+    workflow.add_edge("generate_answer", "grade_answer")
 
-workflow.add_edge("rewrite_query", "route_query")
+    workflow.add_conditional_edges("grade_answer", check_answer_grade,
+                                   {"rewrite_query": "rewrite_query", "answer is ok": END, "end": END})
 
-in_memory_checkpoint_saver = MemorySaver()
-app = workflow.compile(checkpointer=in_memory_checkpoint_saver)
+    workflow.add_edge("rewrite_query", "route_query")
 
+    in_memory_checkpoint_saver = MemorySaver()
+    return workflow.compile(checkpointer=in_memory_checkpoint_saver)
 
-async def run_app(query: str, thread_id: str):
+
+async def run_app(query: str, thread_id: str, timeout: float = deadline.RUN_TIMEOUT):
     query = {"query": query}
     config = {"configurable": {"thread_id": thread_id}}
-    async for output in app.astream(query, config):
-        for key, value in output.items():
-            pprint(f"Node '{key}', thread_id={thread_id}")
-            # pprint(f"'{value}'")
-            if "final_answer" in value:
-                pprint(f"'Final answer: {value["final_answer"].content}'")
-            if "answer_score" in value:
-                pprint(f"'Answer score: {value["answer_score"]}'")
-        print("-------------------------------------------------------------------------")
+    try:
+        # A user is waiting for the answer; the conversations take turns for the LLM
+        with llm_scheduler.scheduling("interactive", tenant=thread_id):
+            async with deadline.limit(timeout):
+                async for output in get_app().astream(query, config):
+                    for key, value in output.items():
+                        pprint(f"Node '{key}', thread_id={thread_id}")
+                        # pprint(f"'{value}'")
+                        if "final_answer" in value:
+                            pprint(f"'Final answer: {value['final_answer'].content}'")
+                        if "answer_score" in value:
+                            pprint(f"'Answer score: {value['answer_score']}'")
+                    print("-------------------------------------------------------------------------")
+    except deadline.DeadlineExceeded as e:
+        print(f"thread_id={thread_id}: {e}, the run was cancelled")
 
 
 async def execute_queries():
@@ -278,4 +340,8 @@ async def execute_queries():
     )
 
 
-asyncio.run(execute_queries())
+if __name__ == "__main__":
+    asyncio.run(execute_queries())
+    ollama_models.get_model_manager().print_report()
+    model_cascade.print_report()
+    llm_scheduler.get_scheduler().print_report()
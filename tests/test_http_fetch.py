@@ -0,0 +1,98 @@
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common.http_fetch import HttpFetcher
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+class Handler(BaseHTTPRequestHandler):
+    """/page answers with validators and 304s when they match; /busy answers with the status in the query."""
+
+    requests = []
+
+    def do_GET(self):
+        Handler.requests.append((self.path, dict(self.headers)))
+        if self.path == "/page":
+            if self.headers.get("If-None-Match") == ETAG or self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                self.send_response(304)
+                self.send_header("ETag", ETAG)
+                self.end_headers()
+                return
+            body = b"hello"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("ETag", ETAG)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.startswith("/busy"):
+            status, _, retry_after = self.path.split("?", 1)[1].partition("&")
+            self.send_response(int(status))
+            self.send_header("Retry-After", retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    # No transport retries, so each test sees exactly the responses of the server
+    return HttpFetcher(cache_dir=str(tmp_path), host_min_interval={}, retries=0)
+
+
+def test_cache_hit_within_ttl(server, fetcher):
+    first = fetcher.get(server + "/page", ttl=60)
+    second = fetcher.get(server + "/page", ttl=60)
+
+    assert (first.from_cache, second.from_cache) == (False, True)
+    assert second.content == b"hello"
+    assert len(Handler.requests) == 1
+
+
+def test_revalidates_with_etag_and_last_modified(server, fetcher):
+    fetcher.get(server + "/page", ttl=0)
+    response = fetcher.get(server + "/page", ttl=0)
+
+    assert response.status_code == 200
+    assert response.from_cache is True
+    assert response.content == b"hello"
+    _, headers = Handler.requests[-1]
+    assert headers["If-None-Match"] == ETAG
+    assert headers["If-Modified-Since"] == LAST_MODIFIED
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_backs_off_for_retry_after(server, fetcher, status):
+    response = fetcher.get(f"{server}/busy?{status}&1")
+    assert response.status_code == status
+
+    start = time.monotonic()
+    fetcher.get(server + "/page")
+    assert time.monotonic() - start >= 0.9
+
+
+def test_malformed_retry_after_uses_default_delay(server, fetcher):
+    fetcher.get(f"{server}/busy?429&soon")
+
+    delay = fetcher._host_next_slot["127.0.0.1"] - time.monotonic()
+    assert 1.5 < delay <= 2.0